@@ -3,17 +3,33 @@ HTTP Client boilerplate code to conquer the world.
 """
 
 import asyncio
+import base64
+import bisect
+import codecs
+import collections
+import collections.abc
+import contextlib
+import contextvars
 import copy
+import email.utils
+import functools
+import hashlib
 import httpx
 import inspect
 import json
+import logging
 import math
+import operator
 import os
+import random
+import re
+import sqlite3
 import ssl
+import time
 import uuid
 import yaml
 
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from urllib.parse import parse_qs
 
@@ -22,16 +38,39 @@ try:
 except ImportError:
     truststore = None
 
+# faster JSON backends
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# incremental JSON parser
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 from cli2 import display
 from cli2.asyncio import async_resolve
 from cli2.cli import Argument, Command, Group, cmd, hide
 from cli2.colors import colors
-from cli2.log import log
+from cli2.log import enabled as log_enabled, log
 from cli2.mask import Mask
 
 
+# client which token_get() is running in this context
+_token_getting = contextvars.ContextVar('token_getting', default=None)
+
+
 __all__ = [
+    'Batch',
     'ClientError',
+    'CircuitOpenError',
     'ResponseError',
     'TokenGetError',
     'RefusedResponseError',
@@ -40,16 +79,31 @@ __all__ = [
     'FieldValueError',
     'FieldExternalizeError',
     'VirtualField',
+    'CircuitBreaker',
     'Client',
     'ClientCommand',
+    'Collection',
+    'CollectionStore',
     'DateTimeField',
+    'DecorrelatedBackoff',
+    'ExponentialBackoff',
     'Field',
+    'FileResponseCache',
     'Handler',
+    'JSONCodec',
     'JSONStringField',
+    'LinearBackoff',
     'Model',
     'ModelCommand',
+    'Page',
     'Paginator',
+    'Plan',
+    'PoolMetrics',
+    'RateLimiter',
     'Related',
+    'ResponseCache',
+    'RetryBudget',
+    'SQLiteCollectionStore',
 ]
 
 
@@ -94,7 +148,38 @@ class Paginator:
     .. py:attribute:: callback
 
         Async callback called for every item before filtering by expressions.
+
+    .. py:attribute:: concurrency
+
+        Maximum number of pages to request at the same time once
+        :py:attr:`total_pages` is known, see :py:meth:`prefetch`.
+        Default: 1
+
+    .. py:attribute:: streaming
+
+        Wether to parse items while the response downloads instead of
+        paginating, see :py:meth:`stream`. Default: False
+
+    .. py:attribute:: stream_key
+
+        Key of the items list in the streamed JSON object, None if the
+        response is a JSON list.
+
+    .. py:attribute:: lazy
+
+        Wether to return pages as :py:class:`Page` objects which instanciate
+        models on access, see :py:meth:`view`. Default: False
+
+    .. py:attribute:: store
+
+        :py:class:`CollectionStore` to answer from, see :py:meth:`local`.
+        Default: None
     """
+    concurrency = 1
+    streaming = False
+    stream_key = None
+    lazy = False
+    store = None
 
     def __init__(self, client, url, params=None, model=None, expressions=None,
                  callback=None):
@@ -123,6 +208,7 @@ class Paginator:
         self._total_pages = None
         self._total_items = None
         self._reverse = False
+        self._plan = None
 
     def reverse(self):
         """
@@ -137,6 +223,107 @@ class Paginator:
         obj._reverse = True
         return obj
 
+    def prefetch(self, concurrency):
+        """
+        Return a copy of this :py:class:`Paginator` object which requests up
+        to ``concurrency`` pages at the same time, while still yielding items
+        in page order.
+
+        Prefetching starts after the first response, and only if
+        :py:meth:`pagination_initialize` sets :py:attr:`total_pages`, or
+        :py:attr:`total_items` and :py:attr:`per_page`. Reverse iteration
+        remains sequential.
+
+        .. code-block:: python
+
+            async for item in client.Model.find().prefetch(10):
+                print(item)
+
+        :param concurrency: Maximum number of pages to request at once
+        """
+        obj = copy.copy(self)
+        obj.concurrency = concurrency
+        return obj
+
+    def stream(self, key=None):
+        """
+        Return a copy of this :py:class:`Paginator` object which requests a
+        single streamed response, and yields items as they're parsed, so that
+        memory stays bounded whatever the size of the response.
+
+        Uses ijson if installed, the stdlib otherwise, see
+        :py:meth:`JSONCodec.items`.
+
+        .. code-block:: python
+
+            async for item in client.paginate('/huge').stream():
+                print(item)
+
+        :param key: Key of the items list if the response is a JSON object.
+        """
+        obj = copy.copy(self)
+        obj.streaming = True
+        obj.stream_key = key
+        return obj
+
+    def view(self):
+        """
+        Return a copy of this :py:class:`Paginator` object which keeps the
+        raw data of each page in a :py:class:`Page`, and only instanciates
+        models for the items it yields.
+
+        Python expressions are evaluated on the raw data with
+        :py:meth:`Field.value`, which saves most allocations on large scans
+        that filter out most items, unless there's a :py:attr:`callback`,
+        which needs every model object anyway.
+
+        .. code-block:: python
+
+            async for obj in client.YourModel.find(
+                client.YourModel.status == 'failed',
+            ).view():
+                print(obj)
+        """
+        obj = copy.copy(self)
+        obj.lazy = True
+        return obj
+
+    def local(self, store):
+        """
+        Return a copy of this :py:class:`Paginator` object which answers from
+        a snapshot of the collection in a :py:class:`CollectionStore`,
+        evaluating all expressions locally. :py:meth:`Model.paginate` does
+        that for models with a :py:attr:`Model.store`.
+
+        .. code-block:: python
+
+            async for obj in client.paginate('/huge').local(store):
+                print(obj)
+
+        :param store: :py:class:`CollectionStore` object, or None to disable.
+        """
+        obj = copy.copy(self)
+        obj.store = store
+        return obj
+
+    async def fetch(self, params=None):
+        """
+        Return the raw data of all items, regardless of expressions, for
+        :py:meth:`CollectionStore.collection`.
+
+        :param params: Dict of additionnal GET parameters.
+        """
+        obj = copy.copy(self)
+        obj.store = None
+        obj.lazy = False
+        obj._reverse = False
+        obj.callback = None
+        obj.expressions = []
+        obj._plan = None
+        obj.params = dict(self.params, **(params or {}))
+        return [item.data if isinstance(item, Model) else item
+                async for item in obj]
+
     async def last_item(self):
         """
         Return the last item of a paginated request.
@@ -238,7 +425,7 @@ class Paginator:
         :param response: Response to parse
         """
         try:
-            data = response.json()
+            data = self.client.response_data(response)
         except json.JSONDecodeError:
             return []
         return self.data_items(data)
@@ -258,20 +445,115 @@ class Paginator:
                     items_list = value
                     break
 
-        items = [self.model(item) for item in items_list]
+        if self.lazy:
+            items = Page(self.model, items_list)
+        else:
+            items = [self.model(item) for item in items_list]
         if not self.per_page:
             self.per_page = len(items_list)
 
         return items
 
     def python_filter(self):
-        filters = [
-            f
-            for f in self.expressions
-            if not f.parameterable
-        ]
-        if filters:
-            return And(*filters)
+        """
+        Return the residual of :py:meth:`plan`: an :py:class:`And` of the
+        expressions that must be evaluated in Python, None if there's none.
+        """
+        return self.plan().residual
+
+    def plan(self):
+        """
+        Return the :py:class:`Plan` splitting :py:attr:`expressions` into GET
+        parameters and a Python residual, computed once per paginator.
+
+        Expressions are and'ed together, so every one that
+        :py:meth:`translate` converts is pushed to the server, including
+        those of nested :py:class:`And`, and only the rest are evaluated in
+        Python. An :py:class:`Or` is pushed only if it tests the same field
+        for equality with several values and the field has an ``in``
+        operator, otherwise it's evaluated in Python as a whole, as are
+        :py:class:`Filter` expressions.
+        """
+        if self._plan is None:
+            self._plan = Plan(self.params)
+            for expression in self.expressions:
+                self._plan.add(expression, self.translate)
+        return self._plan
+
+    def translate(self, expression):
+        """
+        Return the GET parameters for an expression, None if it must be
+        evaluated in Python.
+
+        Uses, in this order:
+
+        - the :py:attr:`Field.parameters` of the expression field,
+        - the :py:attr:`Client.operators` with the :py:attr:`Field.parameter`
+          of the expression field,
+        - the ``params()`` method of the expression, for ``eq`` and custom
+          expressions.
+
+        Override this for APIs that need more than that.
+
+        :param expression: :py:class:`Expression` object
+        """
+        op = expression.operator
+        if isinstance(expression, Or):
+            # field IN values, if all are equalities on the same field
+            field = getattr(expression.expressions[0], 'field', None)
+            if not all(
+                type(exp) is Equal and exp.field is field
+                for exp in expression.expressions
+            ):
+                return None
+            op = 'in'
+            value = [exp.value for exp in expression.expressions]
+        elif op:
+            field = expression.field
+            value = expression.value
+        else:
+            field = None
+
+        if field is not None:
+            name = (field.parameters or {}).get(op, None)
+            if name:
+                return {name: value}
+
+            translation = (self.client.operators or {}).get(op, None)
+            if translation and field.parameter:
+                if callable(translation):
+                    return translation(field.parameter, value)
+                return {translation.format(parameter=field.parameter): value}
+
+        if not getattr(expression, 'parameterable', False):
+            return None
+        params = dict()
+        try:
+            expression.params(params)
+        except NotImplementedError:
+            return None
+        return params
+
+    def explain(self):
+        """
+        Return a description of the request and of the :py:meth:`plan`:
+        which expressions are pushed down to the server, and which are
+        evaluated in Python.
+
+        .. code-block:: python
+
+            print(client.YourModel.find(
+                client.YourModel.created > '2024-01-01',
+                client.YourModel.name.startswith('foo'),
+            ).explain())
+        """
+        plan = self.plan()
+        url = httpx.URL(self.url, params=self.page_parameters(1))
+        return '\n'.join([
+            f'GET {url}',
+            'server: ' + (', '.join(map(repr, plan.pushed)) or '-'),
+            'python: ' + (', '.join(map(repr, plan.residuals)) or '-'),
+        ])
 
     async def page_items(self, page_number):
         """
@@ -285,21 +567,25 @@ class Paginator:
             # pagination_parameters not implemented, can't paginate
             return []
 
+    def page_parameters(self, page_number):
+        """
+        Return the GET parameters for a page.
+
+        :param page_number: Page number to get the parameters for
+        """
+        params = self.params.copy()
+        if page_number > 1:
+            self.pagination_parameters(params, page_number)
+        params.update(self.plan().params)
+        return params
+
     async def page_response(self, page_number):
         """
         Return the response for a page.
 
         :param page_number: Page number to get the items from
         """
-        params = self.params.copy()
-        if page_number > 1:
-            try:
-                self.pagination_parameters(params, page_number)
-            except NotImplementedError:
-                raise
-        for expression in self.expressions:
-            if expression.parameterable:
-                expression.params(params)
+        params = self.page_parameters(page_number)
         response = await self.client.get(self.url, params=params, quiet=True)
         if not self.initialized:
             await self.initialize(response)
@@ -311,6 +597,16 @@ class Paginator:
         """
         callback = callback or self.callback
 
+        if self.store:
+            async for item in self._local(callback):
+                yield item
+            return
+
+        if self.streaming:
+            async for item in self._stream(callback):
+                yield item
+            return
+
         if self._reverse and not self.total_pages:
             first_page_response = await self.page_response(1)
             page = self.total_pages
@@ -320,38 +616,140 @@ class Paginator:
             page = self.page_start
 
         python_filter = self.python_filter()
+        if python_filter:
+            matches = python_filter.matcher()
+            select = python_filter.matcher_page()
 
         async def yielder(items):
             if callback:
                 await asyncio.gather(*[callback(item) for item in items])
+            if isinstance(items, Page) and python_filter and not callback:
+                # evaluate expressions on raw data
+                for index in select(items.data, items.__getitem__):
+                    yield items[index]
+                return
             for item in items:
-                if not python_filter or python_filter.matches(item):
+                if not python_filter or matches(item):
                     yield item
 
-        while items := await self.page_items(page):
-            if not items:
-                continue
+        # page number -> task of prefetched page items
+        tasks = dict()
+        try:
+            while items := await self._page_items(page, tasks):
+                if not items:
+                    continue
 
-            if self._reverse:
-                items = reversed(items)
+                if self._reverse:
+                    items = items[::-1]
+                else:
+                    self._prefetch(page, tasks)
 
-            async for item in yielder(items):
-                yield item
+                async for item in yielder(items):
+                    yield item
 
-            if self._reverse:
-                page -= 1
-                if not page:
-                    break
-                if page == 1:
-                    # use cached first page response
-                    items = self.response_items(first_page_response)
-                    async for item in yielder(reversed(items)):
-                        yield item
-                    break
-            else:
-                if page == self.total_pages:
-                    break
-                page += 1
+                if self._reverse:
+                    page -= 1
+                    if not page:
+                        break
+                    if page == 1:
+                        # use cached first page response
+                        items = self.response_items(first_page_response)
+                        async for item in yielder(items[::-1]):
+                            yield item
+                        break
+                else:
+                    if page == self.total_pages:
+                        break
+                    page += 1
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            # retrieve exceptions, and let requests release their resources
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    async def _stream(self, callback):
+        """
+        Yield items from a streamed response.
+        """
+        python_filter = self.python_filter()
+        if python_filter:
+            matches = python_filter.matcher()
+            matches_data = python_filter.matcher_data()
+        stream = self.client.stream(
+            'GET',
+            self.url,
+            params=self.page_parameters(1),
+            quiet=True,
+        )
+        async with stream as response:
+            items = self.client.json_codec.items(
+                response.aiter_bytes(),
+                self.stream_key,
+            )
+            async for data in items:
+                if self.lazy and python_filter and not callback:
+                    # evaluate expressions on raw data
+                    page = Page(self.model, [data])
+                    if matches_data(data, page.item(0)):
+                        yield page[0]
+                    continue
+
+                item = self.model(data)
+                if callback:
+                    await callback(item)
+                if not python_filter or matches(item):
+                    yield item
+
+    async def _local(self, callback):
+        """
+        Yield items from the :py:attr:`store` snapshot.
+        """
+        collection = await self.store.collection(self)
+        expression = And(*self.expressions) if self.expressions else None
+        if callback:
+            # callbacks may change any field, don't use indexes
+            datas = collection.datas
+        else:
+            datas = collection.select(expression)
+        if self._reverse:
+            datas = datas[::-1]
+
+        if callback:
+            # yielded objects must not change the snapshot
+            items = [self.model(copy.deepcopy(data)) for data in datas]
+            await asyncio.gather(*[callback(item) for item in items])
+            matches = expression.matcher() if expression else None
+            for item in items:
+                if not matches or matches(item):
+                    yield item
+            return
+
+        if expression:
+            page = Page(self.model, datas)
+            indexes = expression.matcher_page()(datas, page.__getitem__)
+        else:
+            indexes = range(len(datas))
+        for index in indexes:
+            yield self.model(copy.deepcopy(datas[index]))
+
+    async def _page_items(self, page_number, tasks):
+        """
+        Return the items of a page, from a prefetch task if any.
+        """
+        if page_number in tasks:
+            return await tasks.pop(page_number)
+        return await self.page_items(page_number)
+
+    def _prefetch(self, page_number, tasks):
+        """
+        Schedule requests for up to :py:attr:`concurrency` following pages.
+        """
+        if self.concurrency < 2 or not self.total_pages:
+            return
+        last = min(page_number + self.concurrency, self.total_pages)
+        for number in range(page_number + 1, last + 1):
+            if number not in tasks:
+                tasks[number] = asyncio.create_task(self.page_items(number))
 
     async def first(self):
         """ Return first item """
@@ -359,6 +757,53 @@ class Paginator:
             return item
 
 
+class Page(collections.abc.Sequence):
+    """
+    Compact list of raw item data, which instanciates models on access, used
+    by :py:meth:`Paginator.view`.
+
+    .. py:attribute:: model
+
+        Model class, or ``dict``.
+
+    .. py:attribute:: data
+
+        List of raw item data.
+    """
+    __slots__ = ('model', 'data', 'objects')
+
+    def __init__(self, model, data):
+        self.model = model
+        self.data = data
+        self.objects = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Page(self.model, self.data[index])
+
+        if index < 0:
+            index += len(self.data)
+        if self.objects is None:
+            self.objects = dict()
+        if index not in self.objects:
+            self.objects[index] = self.model(self.data[index])
+        return self.objects[index]
+
+    def item(self, index):
+        """
+        Return a callable that returns the model object at an index.
+
+        :param index: Item index.
+        """
+        return functools.partial(self.__getitem__, index)
+
+    def __repr__(self):
+        return f'<Page {self.model.__name__} x{len(self.data)}>'
+
+
 class Field:
     """
     Field descriptor for models.
@@ -384,23 +829,77 @@ class Field:
         ``foo/bar`` then it will control the ``bar`` key of the ``foo`` dict in
         the model's data dict.
 
+    .. py:attribute:: path
+
+        Tuple of keys compiled from :py:attr:`data_accessor` when it's set.
+
     .. py:attribute:: parameter
 
         Name of the GET parameter on the model's :py:attr:`Model.url_list`, if
         any. So that the filter will be converted to a GET parameter.
         Otherwise, filtering will happen in Python.
 
+    .. py:attribute:: parameters
+
+        Dict of operator names to GET parameters, for the other operators
+        that the endpoint supports, ie.
+        ``dict(gt='created__gt', lt='created__lt')``. Operators are ``eq``,
+        ``lt``, ``gt``, ``startswith`` and ``in``, see
+        :py:meth:`Paginator.plan`.
+
     .. py:attribute:: callback
 
         Callback function to define a default value. Any field with a callback
         will provision the :py:attr:`Model.data` dict automatically.
+
+    .. py:attribute:: pure
+
+        True if :py:meth:`externalize` doesn't use the model object and there
+        is no :py:attr:`callback`, so that :py:meth:`value` can work on raw
+        data. Set this to False in subclasses that do use the model object.
     """
-    def __init__(self, data_accessor=None, parameter=None, callback=None):
+    def __init__(self, data_accessor=None, parameter=None, callback=None,
+                 parameters=None):
         self.data_accessor = data_accessor
         self.parameter = parameter
+        self.parameters = parameters
         self.callback = callback
         self.callback_dependencies = []
 
+    @property
+    def pure(self):
+        # raw data isn't provisioned by callbacks
+        return self.callback is None
+
+    @property
+    def data_accessor(self):
+        return self._data_accessor
+
+    @data_accessor.setter
+    def data_accessor(self, value):
+        self._data_accessor = value
+        self.compile()
+
+    def compile(self):
+        """
+        Compile :py:attr:`data_accessor` into :py:attr:`path` and a
+        specialized :py:meth:`get`, so that accessing a field doesn't parse
+        it again.
+        """
+        accessor = self._data_accessor
+        self.path = tuple(accessor.split('/')) if accessor else ()
+        if type(self).get is not Field.get or not self.path:
+            return
+
+        if len(self.path) == 1:
+            self.get = operator.itemgetter(self.path[0])
+        else:
+            def get(data, path=self.path):
+                for key in path:
+                    data = data[key]
+                return data
+            self.get = get
+
     def __get__(self, obj, objtype=None):
         """
         Get the value of a field for an object.
@@ -430,7 +929,7 @@ class Field:
         """
         try:
             old_value = getattr(obj, self.name)
-            if self.name not in obj.changed_fields and value != old_value:
+            if value != old_value and self.name not in obj.changed_fields:
                 obj.changed_fields[self.name] = old_value
         except FieldExternalizeError:
             obj.changed_fields[self.name] = None
@@ -447,14 +946,31 @@ class Field:
             return self.__get__(data, type(data))
 
         try:
-            data = self.get(obj.data)
+            return self.get(data)
         except KeyError:
             return None
 
-        return data
+    def value(self, data):
+        """
+        Return the external value from raw model data, without instanciating
+        a model, used to evaluate expressions in :py:meth:`Paginator.view`.
+
+        :param data: Raw model data dict.
+        """
+        try:
+            value = self.get(data)
+        except KeyError:
+            value = None
+        return self.externalize(None, value)
 
     def get(self, data):
-        for key in self.data_accessor.split('/'):
+        """
+        Return the value for :py:attr:`path` in data, replaced by a
+        specialized function by :py:meth:`compile`.
+
+        :param data: Model data dict.
+        """
+        for key in self.path:
             data = data[key]
         return data
 
@@ -470,15 +986,13 @@ class Field:
         """
         Using :py:attr:`data_accessor`, set the value in :py:attr:`Model.data`
         """
-        parts = self.data_accessor.split('/')
+        *parents, key = self.path
         data = obj.data
-        for number, key in enumerate(parts, start=1):
-            if number == len(parts):
-                data[key] = value
-                break
-            if key not in data:
-                data[key] = dict()
-            data = data[key]
+        for parent in parents:
+            if parent not in data:
+                data[parent] = dict()
+            data = data[parent]
+        data[key] = value
 
     def internalize(self, obj, value):
         """
@@ -566,6 +1080,10 @@ class VirtualField(Field):
     def is_set(self, obj):
         return self.name in obj._data_virtual
 
+    def value(self, data):
+        # models instanciated with data also read virtual fields from it
+        return data.get(self.name)
+
 
 class MutableField(Field):
     """
@@ -725,6 +1243,8 @@ class Related(MutableField):
 
         Set this to True if you're expecting a list of models in the field.
     """
+    pure = False
+
     def __init__(self, model, many=False, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.model = model
@@ -804,6 +1324,10 @@ class ModelMetaclass(type):
         if 'Paginator' in attributes:
             attributes['paginator'] = attributes['Paginator']
 
+        # keep the compact instance layout of Model, which still has
+        # __dict__ and __weakref__ slots like any other object
+        attributes.setdefault('__slots__', ())
+
         cls = super().__new__(cls, name, bases, attributes)
         client_class = getattr(cls, '_client_class', None)
         cls.cmdclass = type(
@@ -845,6 +1369,12 @@ class ModelMetaclass(type):
 
         process_bases(cls)
 
+        cls._callback_fields = {
+            key: field
+            for key, field in cls._fields.items()
+            if field.callback
+        }
+
         return cls
 
     @property
@@ -897,6 +1427,38 @@ class Model(metaclass=ModelMetaclass):
 
         Object URL based on :py:attr:`url_detail` and :py:attr:`id_field`.
 
+    .. py:attribute:: url_bulk
+
+        Optionnal URL of a bulk endpoint, used by :py:meth:`bulk_create`,
+        :py:meth:`bulk_update` and :py:meth:`bulk_delete` through
+        :py:meth:`bulk_request`. May be a format string using a client
+        ``client`` variable.
+
+    .. py:attribute:: bulk_size
+
+        Maximum number of objects per :py:meth:`bulk_request`. Default: 100
+
+    .. py:attribute:: bulk_methods
+
+        Dict of bulk action to HTTP method for :py:meth:`bulk_request`.
+
+    .. py:attribute:: store
+
+        Optionnal :py:class:`CollectionStore` or
+        :py:class:`SQLiteCollectionStore`, to answer :py:meth:`find` and
+        :py:meth:`paginate` from local snapshots of collections:
+
+        .. code-block:: python
+
+            class YourModel(YourClient.Model):
+                store = chttpx.CollectionStore(ttl=300, indexes=['status'])
+
+    .. py:attribute:: modified_since
+
+        Optionnal name of the GET parameter of :py:attr:`url_list` to get
+        only the items modified since a date, so that :py:attr:`store`
+        snapshots are synced incrementally.
+
     .. py:attribute:: cli_kwargs
 
         Dict of kwargs to use to create the :py:class:`~cli2.cli.Group` for
@@ -909,11 +1471,26 @@ class Model(metaclass=ModelMetaclass):
         :py:meth:`Client.factory`, :py:meth:`Client.setargs` and
         :py:meth:`Client.post_call` methods.
     """
+    __slots__ = (
+        '_data',
+        '_virtual',
+        '_data_updating',
+        '_dirty',
+        '_cache',
+        '_changed',
+        '__dict__',
+        '__weakref__',
+    )
     paginator = None
     cmdclass = ModelCommand
     url_list = None
     url_detail = '{self.url_list}/{self.id_value}'
+    url_bulk = None
+    bulk_size = 100
+    bulk_methods = dict(create='POST', update='PATCH', delete='DELETE')
     id_field = 'id'
+    store = None
+    modified_since = None
     cli_kwargs = dict()
 
     def __init__(self, data=None, **values):
@@ -923,17 +1500,54 @@ class Model(metaclass=ModelMetaclass):
         :param data: JSON Data
         """
         self._data = data or dict()
-        self._data_virtual = data or dict()
+        # bookkeeping structures are allocated on first use
+        self._virtual = data or None
         self._data_updating = False
-        self._dirty_fields = []
-        self._field_cache = dict()
+        self._dirty = None
+        self._cache = None
+        self._changed = None
 
-        self.changed_fields = dict()
-        for key, value in values.items():
-            setattr(self, key, value)
+        if values:
+            for key, value in values.items():
+                setattr(self, key, value)
 
-        # actually reset that
-        self.changed_fields = dict()
+            # actually reset that
+            self._changed = None
+
+    @property
+    def _data_virtual(self):
+        if self._virtual is None:
+            self._virtual = dict()
+        return self._virtual
+
+    @property
+    def _dirty_fields(self):
+        if self._dirty is None:
+            self._dirty = []
+        return self._dirty
+
+    @_dirty_fields.setter
+    def _dirty_fields(self, value):
+        self._dirty = value
+
+    @property
+    def _field_cache(self):
+        if self._cache is None:
+            self._cache = dict()
+        return self._cache
+
+    @property
+    def changed_fields(self):
+        """
+        Dict of changed field names and their previous values.
+        """
+        if self._changed is None:
+            self._changed = dict()
+        return self._changed
+
+    @changed_fields.setter
+    def changed_fields(self, value):
+        self._changed = value
 
     @property
     def data(self):
@@ -943,12 +1557,13 @@ class Model(metaclass=ModelMetaclass):
         if not self._data_updating:
             self._data_updating = True
 
-            if self._dirty_fields:
-                for field in self._dirty_fields:
+            if self._dirty:
+                for field in self._dirty:
                     field.clean(self)
-                self._dirty_fields = []
+                self._dirty = None
 
-            self._data_callbacks()
+            if self._callback_fields:
+                self._data_callbacks()
 
             self._data_updating = False
 
@@ -957,8 +1572,8 @@ class Model(metaclass=ModelMetaclass):
     def _data_callbacks(self):
         missing = []
         done = []
-        for name, field in self._fields.items():
-            if not field.callback or field.is_set(self):
+        for name, field in self._callback_fields.items():
+            if field.is_set(self):
                 continue
 
             ready = True
@@ -997,10 +1612,15 @@ class Model(metaclass=ModelMetaclass):
     @classmethod
     def paginate(cls, url, *expressions, **params):
         """
-        Return a :py:class:`Paginator` based on :py:attr:`url_list`
+        Return a :py:class:`Paginator` based on :py:attr:`url_list`, which
+        answers from the :py:attr:`store` if any.
+
         :param expressions: :py:class:`Expression` list
         """
-        return cls.paginator(cls.client, url, params, cls, expressions)
+        paginator = cls.paginator(cls.client, url, params, cls, expressions)
+        if cls.store:
+            paginator = paginator.local(cls.store)
+        return paginator
 
     @property
     def cli2_display(self):
@@ -1022,35 +1642,142 @@ class Model(metaclass=ModelMetaclass):
         return await self.client.delete(self.url)
 
     @classmethod
-    @cmd(condition=lambda cls: cls.url_list, doc="""
-    POST request to create.
+    async def bulk_create(cls, objs, concurrency=None):
+        """
+        Create objects with :py:meth:`instanciate`, or with
+        :py:meth:`bulk_request` if :py:attr:`url_bulk` is set.
 
-    Example:
+        Requests run in a :py:class:`Batch`, failures don't stop the others:
 
-        create name=foo
-    """)
-    async def create(cls, **kwargs):
-        """
-        Instanciate a model with kwargs and run :py:meth:`save`.
+        .. code-block:: python
+
+            errors = await client.YourModel.bulk_create(
+                [dict(name=f'obj{i}') for i in range(50_000)],
+            )
+            for obj, exc in errors:
+                print(obj.data, exc)
+
+        :param objs: Model objects or data dicts.
+        :param concurrency: Override for :py:attr:`Batch.concurrency`.
+        :return: List of ``(obj, exception)`` for each failed object.
         """
-        obj = cls(**kwargs)
-        await obj.save()
-        return obj
+        objs = [obj if isinstance(obj, Model) else cls(obj) for obj in objs]
+        return await cls._bulk('create', objs, concurrency)
 
     @classmethod
-    @cmd(color='green', condition=lambda cls: cls.url_list, doc="""
-    Get a model based on kwargs.
+    async def bulk_update(cls, objs, concurrency=None):
+        """
+        Update objects with :py:meth:`update`, or with :py:meth:`bulk_request`
+        if :py:attr:`url_bulk` is set, see :py:meth:`bulk_create`.
 
-    Example:
+        :param objs: Model objects.
+        :param concurrency: Override for :py:attr:`Batch.concurrency`.
+        :return: List of ``(obj, exception)`` for each failed object.
+        """
+        return await cls._bulk('update', objs, concurrency)
 
-        get id=3
-    """)
-    async def get(cls, **kwargs):
+    @classmethod
+    async def bulk_delete(cls, objs, concurrency=None):
         """
-        Instanciate a model with kwargs and run :py:meth:`hydrate`.
+        Delete objects with :py:meth:`delete`, or with :py:meth:`bulk_request`
+        if :py:attr:`url_bulk` is set, see :py:meth:`bulk_create`.
+
+        :param objs: Model objects.
+        :param concurrency: Override for :py:attr:`Batch.concurrency`.
+        :return: List of ``(obj, exception)`` for each failed object.
         """
-        obj = cls(**kwargs)
-        await obj.hydrate()
+        return await cls._bulk('delete', objs, concurrency)
+
+    @classmethod
+    async def _bulk(cls, action, objs, concurrency):
+        objs = list(objs)
+        batch = cls.client.batch(concurrency)
+        if cls.url_bulk:
+            chunks = [
+                objs[start:start + cls.bulk_size]
+                for start in range(0, len(objs), cls.bulk_size)
+            ]
+            for chunk in chunks:
+                batch.add(cls.bulk_request, action, chunk)
+        else:
+            method = dict(create='instanciate').get(action, action)
+            chunks = [[obj] for obj in objs]
+            for obj in objs:
+                batch.add(getattr(obj, method))
+        await batch.run()
+
+        return [
+            (obj, batch.errors[index])
+            for index, chunk in enumerate(chunks)
+            if index in batch.errors
+            for obj in chunk
+        ]
+
+    @classmethod
+    async def bulk_request(cls, action, objs):
+        """
+        Send a request to :py:attr:`url_bulk` for a list of objects.
+
+        Sends the list of object data, or of ids to delete, with the
+        :py:attr:`bulk_methods` HTTP method for the action. Objects are
+        hydrated if the response is a list of the same length.
+
+        Override this if your API's bulk endpoint works differently.
+
+        :param action: One of ``create``, ``update``, ``delete``.
+        :param objs: List of up to :py:attr:`bulk_size` model objects.
+        """
+        if action == 'delete':
+            data = [obj.id_value for obj in objs]
+        else:
+            data = [obj.data for obj in objs]
+        response = await cls.client.request(
+            cls.bulk_methods[action],
+            cls.url_bulk,
+            json=data,
+        )
+        if action == 'delete':
+            return response
+
+        try:
+            data = cls.client.response_data(response)
+        except json.JSONDecodeError:
+            return response
+        if isinstance(data, list) and len(data) == len(objs):
+            for obj, item in zip(objs, data):
+                await obj.hydrate(item)
+        return response
+
+    @classmethod
+    @cmd(condition=lambda cls: cls.url_list, doc="""
+    POST request to create.
+
+    Example:
+
+        create name=foo
+    """)
+    async def create(cls, **kwargs):
+        """
+        Instanciate a model with kwargs and run :py:meth:`save`.
+        """
+        obj = cls(**kwargs)
+        await obj.save()
+        return obj
+
+    @classmethod
+    @cmd(color='green', condition=lambda cls: cls.url_list, doc="""
+    Get a model based on kwargs.
+
+    Example:
+
+        get id=3
+    """)
+    async def get(cls, **kwargs):
+        """
+        Instanciate a model with kwargs and run :py:meth:`hydrate`.
+        """
+        obj = cls(**kwargs)
+        await obj.hydrate()
         return obj
 
     async def hydrate(self, data=None):
@@ -1061,7 +1788,7 @@ class Model(metaclass=ModelMetaclass):
         """
         if data is None:
             response = await self.client.get(self.url)
-            data = response.json()
+            data = self.client.response_data(response)
         self.data.update(data)
         self.changed_fields = dict()
 
@@ -1090,7 +1817,7 @@ class Model(metaclass=ModelMetaclass):
         response = await self.client.post(self.url_list, json=self.data)
 
         try:
-            data = response.json()
+            data = self.client.response_data(response)
         except json.JSONDecodeError:
             pass
         else:
@@ -1108,7 +1835,7 @@ class Model(metaclass=ModelMetaclass):
         response = await self.client.post(self.url, json=self.data)
 
         try:
-            data = response.json()
+            data = self.client.response_data(response)
         except json.JSONDecodeError:
             pass
         else:
@@ -1176,6 +1903,56 @@ class ClientMetaclass(type):
         return cls._cli
 
 
+class LinearBackoff:
+    """
+    Sleep ``tries * base`` seconds before a retry.
+
+    .. py:attribute:: base
+
+        Seconds added for each try.
+    """
+    def __init__(self, base=.1):
+        self.base = base
+
+    def __call__(self, tries, previous=None):
+        """
+        Return the number of seconds to sleep before a retry.
+
+        :param tries: Number of tries so far.
+        :param previous: Seconds slept before the previous retry, if any.
+        """
+        return tries * self.base
+
+
+class ExponentialBackoff(LinearBackoff):
+    """
+    Exponential backoff with full jitter: sleep a random number of seconds
+    between 0 and ``base * 2 ** tries``, up to :py:attr:`cap`, so that
+    concurrent requests don't retry in lockstep.
+
+    .. py:attribute:: cap
+
+        Maximum number of seconds to sleep.
+    """
+    def __init__(self, base=.1, cap=10):
+        self.base = base
+        self.cap = cap
+
+    def __call__(self, tries, previous=None):
+        return random.uniform(0, min(self.cap, self.base * 2 ** tries))
+
+
+class DecorrelatedBackoff(ExponentialBackoff):
+    """
+    Decorrelated jitter: sleep a random number of seconds between
+    :py:attr:`base` and three times the previous sleep, up to
+    :py:attr:`cap`.
+    """
+    def __call__(self, tries, previous=None):
+        previous = previous or self.base
+        return min(self.cap, random.uniform(self.base, previous * 3))
+
+
 class Handler:
     """
     .. py:attribute:: tries
@@ -1185,7 +1962,10 @@ class Handler:
 
     .. py:attribute:: backoff
 
-        Will sleep ``number_of_tries * backoff`` prior to retrying.
+        Number of seconds, to sleep ``number_of_tries * backoff`` prior to
+        retrying, or a callable taking the number of tries and the previous
+        sleep and returning the number of seconds to sleep, such as
+        :py:class:`ExponentialBackoff` or :py:class:`DecorrelatedBackoff`.
         Default: `.1`
 
     .. py:attribute:: accepts
@@ -1235,13 +2015,45 @@ class Handler:
         self.tries = self.tries_default if tries is None else tries
         self.backoff = self.backoff_default if backoff is None else backoff
 
-    async def __call__(self, client, response, tries, log):
-        seconds = tries * self.backoff
+    def sleep(self, response, tries):
+        """
+        Return the number of seconds to sleep before retrying a request.
+
+        :param response: httpx Response or Exception.
+        :param tries: Number of tries so far.
+        """
+        backoff = self.backoff
+        if not callable(backoff):
+            return tries * backoff
+
+        try:
+            extensions = response.request.extensions
+        except (RuntimeError, AttributeError):
+            extensions = dict()
+        seconds = backoff(tries, extensions.get('retry_sleep', None))
+        extensions['retry_sleep'] = seconds
+        return seconds
+
+    def retry(self, client, tries):
+        """
+        Return True if the client's :py:attr:`~Client.retry_budget` allows a
+        retry.
+
+        :param client: :py:class:`Client` object.
+        :param tries: Number of tries so far.
+        """
+        budget = getattr(client, 'retry_budget', None)
+        return tries < self.tries and (not budget or budget.withdraw())
 
+    async def __call__(self, client, response, tries, log):
         if isinstance(response, Exception):
-            if tries >= self.tries:
+            if isinstance(response, CircuitOpenError):
+                # fail fast
                 raise response
-            # httpx session is rendered unusable after a TransportError
+            if not self.retry(client, tries):
+                raise response
+            seconds = self.sleep(response, tries)
+            # replace the httpx client that raised a TransportError
             if isinstance(response, httpx.TransportError):
                 kwargs = dict(error=repr(response))
                 try:
@@ -1254,7 +2066,9 @@ class Handler:
                 log.warn('reconnect', **kwargs)
 
                 await asyncio.sleep(seconds)
-                await client.client_reset()
+                await client.client_reset(
+                    getattr(response, 'httpx_client', None),
+                )
             return
 
         if self.accepts:
@@ -1266,15 +2080,16 @@ class Handler:
         if response.status_code in self.refuses:
             raise RefusedResponseError(client, response, tries)
 
-        if tries >= self.tries:
+        if not self.retry(client, tries):
             raise RetriesExceededError(client, response, tries)
+        seconds = self.sleep(response, tries)
 
         if response.status_code in self.retokens:
             if tries:
                 # our authentication is just not working, no need to retry
                 raise TokenGetError(client, response, tries)
             log.warn('retoken')
-            await client.token_reset()
+            await client.token_reset(response.extensions.get('token', None))
 
         log.warn(
             'retry',
@@ -1287,10 +2102,133 @@ class Handler:
         await asyncio.sleep(seconds)
 
 
+class Batch:
+    """
+    Run calls with bounded concurrency, collecting errors instead of raising
+    them, used by the bulk methods of :py:class:`Model`.
+
+    .. code-block:: python
+
+        async with client.batch(concurrency=20) as batch:
+            for obj in objs:
+                batch.add(obj.save)
+
+        for index, exc in batch.errors.items():
+            print(objs[index], exc)
+
+    Requests still go through the client's :py:attr:`~Client.semaphore`,
+    :py:attr:`~Client.limiter` and :py:attr:`~Client.handler`.
+
+    .. py:attribute:: concurrency
+
+        Maximum number of calls to run at the same time. Default: 10
+
+    .. py:attribute:: results
+
+        List of call results in the order they were added, exceptions for
+        failed calls.
+
+    .. py:attribute:: errors
+
+        Dict of call index to exception, for failed calls.
+    """
+    concurrency = 10
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or self.concurrency
+        self.calls = []
+        self.results = []
+        self.errors = dict()
+
+    def add(self, call, *args, **kwargs):
+        """
+        Add a call, return its index.
+
+        :param call: Callable, which may return an awaitable.
+        :param args: Args for the call.
+        :param kwargs: Kwargs for the call.
+        """
+        self.calls.append((len(self.results), call, args, kwargs))
+        self.results.append(None)
+        return len(self.results) - 1
+
+    async def run(self):
+        """
+        Run the added calls, return :py:attr:`results`.
+        """
+        calls = iter(self.calls)
+        self.calls = []
+
+        async def worker():
+            for index, call, args, kwargs in calls:
+                try:
+                    result = call(*args, **kwargs)
+                    if inspect.isawaitable(result):
+                        result = await result
+                except Exception as exc:
+                    self.errors[index] = result = exc
+                self.results[index] = result
+
+        await asyncio.gather(*[
+            worker() for i in range(self.concurrency)
+        ])
+        return self.results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.run()
+
+
+class _ClosingStream(httpx.AsyncByteStream):
+    """
+    Response stream which calls back once closed, to release what a
+    streamed request holds.
+    """
+    def __init__(self, stream, callback):
+        self.stream = stream
+        self.callback = callback
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            if self.callback:
+                callback, self.callback = self.callback, None
+                callback()
+
+
 class ClientError(Exception):
     pass
 
 
+class CircuitOpenError(ClientError):
+    """
+    Raised without sending a request when the :py:class:`CircuitBreaker` is
+    open for its host.
+
+    .. py:attribute:: host
+
+        Host name.
+
+    .. py:attribute:: seconds
+
+        Seconds until the circuit half-opens.
+    """
+    def __init__(self, host, seconds):
+        self.host = host
+        self.seconds = seconds
+        super().__init__(
+            f'Circuit open for {host}, retry in {seconds:.1f} seconds'
+        )
+
+
 class ResponseError(ClientError):
     """
     Beautiful Response Error class.
@@ -1397,42 +2335,1353 @@ class FieldValueError(FieldError):
         self.value = value
 
 
-class FieldExternalizeError(FieldValueError):
-    pass
+class FieldExternalizeError(FieldValueError):
+    pass
+
+
+class ClientCommand(Command):
+    """
+    Client CLI command
+
+    .. py:attribute:: client
+
+        The client object that was constructed from :py:meth:`Client.factory`
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = None
+
+    def setargs(self):
+        """
+        Set a `self` factory of :py:meth:`Client.factory` method, and call
+        :py:meth:`Client.setargs`.
+        """
+        super().setargs()
+        if 'self' in self:
+            self['self'].factory = self.client_class.factory
+        self.client_class.setargs(self)
+
+    async def factories_resolve(self):
+        """ Set :py:attr:`client` after resolving factories. """
+        await super().factories_resolve()
+        if 'self' in self:
+            self.client = self['self'].value
+
+    async def post_call(self):
+        """ Call :py:meth:`Client.post_call`. """
+        if self.client:
+            await self.client.post_call(self)
+
+
+class RateLimiter:
+    """
+    Adaptive per-host rate limiter.
+
+    Each host gets a token bucket, if :py:attr:`rate` is set, and an AIMD
+    concurrency limit: it grows by :py:attr:`increase` for each window of
+    successful (2xx) responses, and is multiplied by :py:attr:`decrease` on
+    429 or 503 responses.
+
+    Requests to a host also wait for its ``Retry-After`` header, or for its
+    ``X-RateLimit-Reset`` header when ``X-RateLimit-Remaining`` reaches 0.
+
+    .. py:attribute:: rate
+
+        Maximum requests per second per host, None for no limit.
+
+    .. py:attribute:: burst
+
+        Number of requests that may be sent at once before :py:attr:`rate`
+        applies. Default: same as rate.
+
+    .. py:attribute:: concurrency
+
+        Initial number of concurrent requests per host. Default: 10
+
+    .. py:attribute:: min_concurrency
+
+        Default: 1
+
+    .. py:attribute:: max_concurrency
+
+        Default: 100
+
+    .. py:attribute:: increase
+
+        Concurrency added after each window of successful responses.
+        Default: 1
+
+    .. py:attribute:: decrease
+
+        Concurrency factor on a 429 or 503 response. Default: .5
+
+    .. py:attribute:: hosts
+
+        Dict of host name to :py:class:`RateLimiterHost`.
+    """
+    throttles = (429, 503)
+
+    def __init__(self, rate=None, burst=None, concurrency=10,
+                 min_concurrency=1, max_concurrency=100, increase=1,
+                 decrease=.5):
+        self.rate = rate
+        self.burst = burst or rate
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.hosts = dict()
+
+    def host(self, name):
+        """
+        Return the :py:class:`RateLimiterHost` for a host name.
+
+        :param name: Host name.
+        """
+        if name not in self.hosts:
+            self.hosts[name] = RateLimiterHost(self)
+        return self.hosts[name]
+
+    async def acquire(self, request):
+        """
+        Wait until a request may be sent.
+
+        :param request: httpx Request.
+        """
+        await self.host(request.url.host).acquire()
+
+    def release(self, request, response=None):
+        """
+        Release a request slot and adapt to the response.
+
+        :param request: httpx Request.
+        :param response: httpx Response, or None if the request failed.
+        """
+        self.host(request.url.host).release(response)
+
+
+class RateLimiterHost:
+    """
+    Rate limit state for a host, see :py:class:`RateLimiter`.
+
+    .. py:attribute:: concurrency
+
+        Current concurrency limit, a float which is rounded down.
+
+    .. py:attribute:: requests
+
+        Number of requests in flight.
+
+    .. py:attribute:: blocked_until
+
+        Monotonic time until which requests must wait.
+    """
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.concurrency = limiter.concurrency
+        self.requests = 0
+        self.tokens = limiter.burst
+        self.refilled = time.monotonic()
+        self.blocked_until = 0
+        self.released = asyncio.Event()
+
+    def _available(self):
+        return self.requests < max(int(self.concurrency), 1)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if self.blocked_until > now:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+
+            if not self._available():
+                await self.released.wait()
+                continue
+
+            if self.limiter.rate:
+                self.tokens = min(
+                    self.limiter.burst,
+                    self.tokens + (now - self.refilled) * self.limiter.rate,
+                )
+                self.refilled = now
+                if self.tokens < 1:
+                    await asyncio.sleep((1 - self.tokens) / self.limiter.rate)
+                    continue
+                self.tokens -= 1
+
+            self.requests += 1
+            return
+
+    def release(self, response=None):
+        self.requests -= 1
+        if response is not None:
+            self.adapt(response)
+        # wake up waiting requests, next ones wait for the next release
+        self.released.set()
+        self.released = asyncio.Event()
+
+    def adapt(self, response):
+        """
+        Adapt the limits to a response.
+
+        :param response: httpx Response.
+        """
+        limiter = self.limiter
+        if response.status_code in limiter.throttles:
+            self.concurrency = max(
+                limiter.min_concurrency,
+                self.concurrency * limiter.decrease,
+            )
+        elif response.is_success:
+            # additive increase: +increase per window of concurrency
+            self.concurrency = min(
+                limiter.max_concurrency,
+                self.concurrency + limiter.increase / self.concurrency,
+            )
+
+        delay = None
+        headers = response.headers
+        if 'retry-after' in headers:
+            delay = self.delay(headers['retry-after'])
+        elif headers.get('x-ratelimit-remaining', None) == '0':
+            delay = self.delay(headers.get('x-ratelimit-reset', ''))
+        if delay:
+            self.blocked_until = max(
+                self.blocked_until,
+                time.monotonic() + delay,
+            )
+
+    @staticmethod
+    def delay(value):
+        """
+        Return the number of seconds to wait from a header value.
+
+        Supports seconds, epoch timestamps and HTTP dates.
+
+        :param value: Header value.
+        """
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                date = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            return max(date.timestamp() - time.time(), 0)
+        if value > 1e9:
+            # epoch timestamp
+            return max(value - time.time(), 0)
+        return value
+
+
+class _Window:
+    """ Sum of values over the last seconds, in one second buckets. """
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.buckets = collections.deque()
+        self.total = 0
+
+    def add(self, value=1):
+        second = int(time.monotonic())
+        if self.buckets and self.buckets[-1][0] == second:
+            self.buckets[-1][1] += value
+        else:
+            self.buckets.append([second, value])
+        self.total += value
+
+    def sum(self):
+        oldest = int(time.monotonic()) - self.seconds
+        while self.buckets and self.buckets[0][0] <= oldest:
+            self.total -= self.buckets.popleft()[1]
+        return self.total
+
+    def clear(self):
+        self.buckets.clear()
+        self.total = 0
+
+
+class RetryBudget:
+    """
+    Client-wide cap of retries, as a fraction of the requests sent over a
+    sliding window, so that a degraded upstream doesn't multiply the load.
+
+    .. py:attribute:: ratio
+
+        Allowed retries per request. Default: .2
+
+    .. py:attribute:: minimum
+
+        Retries allowed per window regardless of the ratio, so that clients
+        with few requests may still retry. Default: 10
+
+    .. py:attribute:: window
+
+        Window size in seconds. Default: 10
+    """
+    def __init__(self, ratio=.2, minimum=10, window=10):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self.requests = _Window(window)
+        self.retries = _Window(window)
+
+    def deposit(self):
+        """ Record a request. """
+        self.requests.add()
+
+    def withdraw(self):
+        """ Record a retry and return True if the budget allows it. """
+        allowed = self.minimum + self.requests.sum() * self.ratio
+        if self.retries.sum() >= allowed:
+            return False
+        self.retries.add()
+        return True
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker: once the error rate of a host crosses
+    :py:attr:`threshold`, requests to that host raise
+    :py:exc:`CircuitOpenError` without being sent for :py:attr:`reset`
+    seconds. Then, one request is let through: if it succeeds, the circuit
+    closes, otherwise it opens again.
+
+    Errors are transport errors and :py:attr:`errors` status codes.
+
+    .. py:attribute:: threshold
+
+        Error rate to open the circuit at. Default: .5
+
+    .. py:attribute:: minimum
+
+        Minimum number of requests in the window before opening the circuit.
+        Default: 10
+
+    .. py:attribute:: window
+
+        Window size in seconds. Default: 10
+
+    .. py:attribute:: reset
+
+        Seconds to wait before letting a request through an open circuit.
+        Default: 30
+
+    .. py:attribute:: hosts
+
+        Dict of host name to dict with ``requests`` and ``errors`` windows,
+        ``opened`` monotonic time or None, and ``trial`` boolean.
+    """
+    errors = (429, 500, 502, 503, 504)
+
+    def __init__(self, threshold=.5, minimum=10, window=10, reset=30):
+        self.threshold = threshold
+        self.minimum = minimum
+        self.window = window
+        self.reset = reset
+        self.hosts = dict()
+
+    def host(self, name):
+        """
+        Return the state of a host.
+
+        :param name: Host name.
+        """
+        if name not in self.hosts:
+            self.hosts[name] = dict(
+                requests=_Window(self.window),
+                errors=_Window(self.window),
+                opened=None,
+                trial=False,
+            )
+        return self.hosts[name]
+
+    def check(self, request):
+        """
+        Raise :py:exc:`CircuitOpenError` if the circuit is open.
+
+        :param request: httpx Request.
+        """
+        host = self.host(request.url.host)
+        if host['opened'] is None:
+            return
+        seconds = host['opened'] + self.reset - time.monotonic()
+        if seconds > 0 or host['trial']:
+            raise CircuitOpenError(request.url.host, max(seconds, 0))
+        host['trial'] = True
+
+    def record(self, request, response):
+        """
+        Record the outcome of a request.
+
+        :param request: httpx Request.
+        :param response: httpx Response, or Exception.
+        """
+        host = self.host(request.url.host)
+        if isinstance(response, Exception):
+            failed = isinstance(response, httpx.TransportError)
+        else:
+            failed = response.status_code in self.errors
+
+        if host['trial']:
+            host['trial'] = False
+            if failed:
+                host['opened'] = time.monotonic()
+            else:
+                host['opened'] = None
+                host['requests'].clear()
+                host['errors'].clear()
+            return
+
+        host['requests'].add()
+        if not failed:
+            return
+        host['errors'].add()
+        requests = host['requests'].sum()
+        if (
+            requests >= self.minimum
+            and host['errors'].sum() / requests >= self.threshold
+        ):
+            host['opened'] = time.monotonic()
+
+    def cancel(self, request):
+        """
+        Forget a request that was cancelled before its outcome, so that
+        another request may be the trial of an open circuit.
+
+        :param request: httpx Request.
+        """
+        self.host(request.url.host)['trial'] = False
+
+
+class JSONCodec:
+    """
+    JSON encoder and decoder used by the :py:class:`Client` for request
+    bodies and responses.
+
+    .. py:attribute:: backend
+
+        One of ``orjson``, ``msgspec`` or ``json``, defaults to the first
+        that is installed.
+    """
+    def __init__(self, backend=None):
+        if backend is None:
+            if orjson:
+                backend = 'orjson'
+            elif msgspec:
+                backend = 'msgspec'
+            else:
+                backend = 'json'
+        self.backend = backend
+
+    def dumps(self, data):
+        """
+        Encode data to JSON bytes.
+
+        :param data: Data to encode.
+        """
+        try:
+            if self.backend == 'orjson':
+                return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+            elif self.backend == 'msgspec':
+                return msgspec.json.encode(data)
+        except (TypeError, OverflowError):
+            # ie. integers too large for the fast backends
+            pass
+        return json.dumps(
+            data,
+            ensure_ascii=False,
+            separators=(',', ':'),
+            allow_nan=False,
+        ).encode()
+
+    def loads(self, content):
+        """
+        Decode JSON bytes or string.
+
+        :param content: JSON to decode.
+        :raise json.JSONDecodeError: For invalid JSON, whatever the backend.
+        """
+        if self.backend == 'orjson':
+            return orjson.loads(content)
+        elif self.backend == 'msgspec':
+            try:
+                return msgspec.json.decode(content)
+            except msgspec.DecodeError as exc:
+                raise json.JSONDecodeError(str(exc), str(content), 0)
+        return json.loads(content)
+
+    async def items(self, chunks, key=None):
+        """
+        Yield the items of a JSON list while it's being downloaded.
+
+        Uses ijson if installed, otherwise a stdlib incremental parser.
+
+        :param chunks: Async iterator of bytes, ie. ``response.aiter_bytes()``
+        :param key: Key of the list if the JSON is an object.
+        """
+        if ijson:
+            prefix = 'item' if key is None else f'{key}.item'
+            items = ijson.sendable_list()
+            coro = ijson.items_coro(items, prefix, use_float=True)
+            async for chunk in chunks:
+                coro.send(chunk)
+                for item in items:
+                    yield item
+                del items[:]
+            coro.close()
+            for item in items:
+                yield item
+            return
+
+        reader = _JSONReader(chunks)
+        char = await reader.skip()
+        if key is not None:
+            await reader.expect('{')
+            while True:
+                char = await reader.skip()
+                if char == '}':
+                    return
+                elif char == ',':
+                    reader.pos += 1
+                    continue
+                name = await reader.value()
+                await reader.expect(':')
+                if name == key:
+                    break
+                await reader.value()
+
+        await reader.expect('[')
+        while True:
+            char = await reader.skip()
+            if char == ']':
+                return
+            elif char == ',':
+                reader.pos += 1
+                continue
+            yield await reader.value()
+
+    def __repr__(self):
+        return f'JSONCodec({self.backend})'
+
+
+class _JSONReader:
+    """ Decode JSON values from an async iterator of bytes. """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'[ \t\n\r]*')
+    number = re.compile(r'-?[0-9.eE+-]+')
+
+    def __init__(self, chunks):
+        self.chunks = chunks.__aiter__()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.done = False
+
+    async def more(self):
+        """ Read the next chunk, return False at the end. """
+        if self.done:
+            return False
+        try:
+            chunk = await self.chunks.__anext__()
+        except StopAsyncIteration:
+            self.done = True
+            chunk = b''
+        self.text = self.text[self.pos:] + self.utf8.decode(chunk, self.done)
+        self.pos = 0
+        return True
+
+    async def skip(self):
+        """ Skip whitespace and return the next character. """
+        while True:
+            self.pos = self.whitespace.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not await self.more():
+                raise json.JSONDecodeError('Unexpected end', self.text, 0)
+
+    async def expect(self, char):
+        if await self.skip() != char:
+            raise json.JSONDecodeError(
+                f'Expecting {char!r}', self.text, self.pos,
+            )
+        self.pos += 1
+
+    async def value(self):
+        """ Decode the next value. """
+        await self.skip()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # incomplete value
+                if not await self.more():
+                    raise
+                continue
+            number = self.number.match(self.text, self.pos)
+            if number and number.end() == len(self.text) and await self.more():
+                # a number could continue in the next chunk
+                continue
+            self.pos = end
+            return value
+
+
+def _cache_control(headers):
+    """ Return the Cache-Control directives of headers as a dict. """
+    directives = dict()
+    for directive in headers.get('cache-control', '').split(','):
+        key, _, value = directive.strip().partition('=')
+        if key:
+            directives[key.lower()] = value.strip('"')
+    return directives
+
+
+def _cache_headers(headers):
+    """ Return the list of headers to cache with a response content. """
+    return [
+        (name, value) for name, value in headers.multi_items()
+        # httpx would decode the content again
+        if name not in ('content-encoding', 'transfer-encoding')
+    ]
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache of GET responses for :py:attr:`Client.cache`.
+
+    Responses are stored unless ``Cache-Control: no-store``, fresh responses
+    are returned without a request while ``max-age`` or ``Expires`` allow it.
+    Stale responses with an ``ETag`` or ``Last-Modified`` header are
+    revalidated with ``If-None-Match`` or ``If-Modified-Since`` headers, and
+    their body reused on a 304 response.
+
+    Cached responses have a ``cache`` extension: ``hit``, ``revalidated`` or
+    ``miss``.
+
+    .. py:attribute:: max_entries
+
+        Maximum number of responses to keep. Default: 1000
+
+    .. py:attribute:: hits
+
+        Number of responses served from the cache, including revalidated.
+
+    .. py:attribute:: misses
+
+        Number of responses that were not in the cache, or changed.
+
+    .. py:attribute:: identity_headers
+
+        Request headers that identify the user, their hashed values are part
+        of the cache key so that responses are never served to another
+        identity. Default: ``('authorization', 'cookie')``
+    """
+    identity_headers = ('authorization', 'cookie')
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return a cache entry dict, or None.
+
+        :param key: Cache key.
+        """
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def set(self, key, entry):
+        """
+        Store a cache entry dict.
+
+        :param key: Cache key.
+        :param entry: Dict with status_code, headers, content, expires and
+                      vary keys.
+        """
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove a cache entry.
+
+        :param key: Cache key.
+        """
+        self.entries.pop(key, None)
+
+    def key(self, request):
+        """
+        Return the cache key for a request.
+
+        :param request: httpx Request.
+        """
+        key = f'{request.method} {request.url}'
+        identity = [
+            request.headers.get(name, '') for name in self.identity_headers
+        ]
+        if any(identity):
+            digest = hashlib.sha256('\n'.join(identity).encode())
+            key += f' {digest.hexdigest()}'
+        return key
+
+    async def send(self, request, send):
+        """
+        Return a response from the cache or from the send callback.
+
+        :param request: httpx Request.
+        :param send: Async callback to actually send the request.
+        """
+        directives = _cache_control(request.headers)
+        if 'no-store' in directives:
+            return await send()
+
+        key = self.key(request)
+        entry = self.get(key)
+        if entry and any(
+            request.headers.get(name) != value
+            for name, value in entry['vary'].items()
+        ):
+            entry = None
+
+        if entry:
+            if 'no-cache' not in directives and entry['expires'] > time.time():
+                self.hits += 1
+                return self.response(request, entry, 'hit')
+
+            headers = httpx.Headers(entry['headers'])
+            if 'etag' in headers:
+                request.headers['if-none-match'] = headers['etag']
+            if 'last-modified' in headers:
+                request.headers['if-modified-since'] = headers['last-modified']
+
+        response = await send()
+
+        if entry and response.status_code == 304:
+            headers = httpx.Headers(entry['headers'])
+            headers.update(response.headers)
+            cached = entry
+            entry = self.entry(request, response, headers, entry['content'])
+            if entry:
+                entry['status_code'] = cached['status_code']
+                self.set(key, entry)
+            else:
+                # the cached content is still valid, but not to store again
+                self.delete(key)
+                entry = dict(cached, headers=_cache_headers(headers))
+            self.hits += 1
+            await response.aclose()
+            return self.response(request, entry, 'revalidated')
+
+        self.misses += 1
+        response.extensions['cache'] = 'miss'
+        if response.status_code == 200:
+            entry = self.entry(request, response, response.headers)
+            if entry:
+                self.set(key, entry)
+            else:
+                self.delete(key)
+        return response
+
+    def entry(self, request, response, headers, content=None):
+        """
+        Return a cache entry dict for a response, None if not cacheable.
+
+        :param request: httpx Request.
+        :param response: httpx Response.
+        :param headers: Headers to cache.
+        :param content: Content to cache, response content by default.
+        """
+        directives = _cache_control(headers)
+        if 'no-store' in directives or headers.get('vary', '') == '*':
+            return None
+
+        expires = time.time()
+        if 'no-cache' in directives:
+            pass
+        elif 'max-age' in directives:
+            try:
+                expires += int(directives['max-age'])
+                expires -= int(headers.get('age', 0))
+            except ValueError:
+                pass
+        elif 'expires' in headers:
+            try:
+                expires = email.utils.parsedate_to_datetime(
+                    headers['expires']
+                ).timestamp()
+            except (TypeError, ValueError):
+                pass
+
+        if expires <= time.time() and not (
+            'etag' in headers or 'last-modified' in headers
+        ):
+            # can't be reused
+            return None
+
+        vary = [
+            name.strip().lower()
+            for name in headers.get('vary', '').split(',')
+            if name.strip()
+        ]
+        return dict(
+            status_code=response.status_code,
+            headers=_cache_headers(headers),
+            content=response.content if content is None else content,
+            expires=expires,
+            vary={name: request.headers.get(name) for name in vary},
+        )
+
+    def response(self, request, entry, cache):
+        """
+        Return a response for a cache entry.
+
+        :param request: httpx Request.
+        :param entry: Cache entry dict.
+        :param cache: Value for the ``cache`` response extension.
+        """
+        return httpx.Response(
+            entry['status_code'],
+            headers=entry['headers'],
+            content=entry['content'],
+            request=request,
+            extensions=dict(cache=cache),
+        )
+
+
+class FileResponseCache(ResponseCache):
+    """
+    On-disk :py:class:`ResponseCache`, to share responses between runs, ie.
+    of a CLI. There is no eviction other than by expiry and revalidation.
+
+    .. py:attribute:: path
+
+        Directory to store responses in, default:
+        ``~/.local/cli2/http``
+    """
+    def __init__(self, path=None):
+        super().__init__()
+        if path is None:
+            path = Path(os.getenv('HOME')) / '.local/cli2/http'
+        self.path = Path(path)
+
+    def file(self, key):
+        return self.path / hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key):
+        try:
+            with self.file(key).open('r') as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        entry['content'] = base64.b64decode(entry['content'])
+        return entry
+
+    def set(self, key, entry):
+        content = base64.b64encode(entry['content']).decode()
+        entry = dict(entry, content=content)
+        file = self.file(key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = file.parent / f'.{file.name}.{os.getpid()}'
+        with tmp.open('w') as fh:
+            json.dump(entry, fh)
+        os.replace(tmp, file)
+
+    def delete(self, key):
+        try:
+            self.file(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class Collection:
+    """
+    Snapshot of the raw data of a collection, in a
+    :py:class:`CollectionStore`.
+
+    .. py:attribute:: datas
+
+        List of raw item data, in collection order.
+
+    .. py:attribute:: keys
+
+        Dict of item identifier to position in :py:attr:`datas`.
+
+    .. py:attribute:: indexes
+
+        Names of the fields to index.
+
+    .. py:attribute:: synced
+
+        Timestamp of the start of the last sync, None if never synced.
+
+    .. py:attribute:: refreshed
+
+        Timestamp of the start of the last full fetch.
+    """
+    def __init__(self, indexes=None):
+        self.datas = []
+        self.keys = dict()
+        self.indexes = indexes or []
+        self.synced = None
+        self.refreshed = None
+        self._index = dict()
+        self._sorted = dict()
+
+    def __len__(self):
+        return len(self.datas)
+
+    def update(self, datas, id_field):
+        """
+        Add or replace items, return the list of their positions.
+
+        Indexes are built again on next use.
+
+        :param datas: List of raw item data.
+        :param id_field: Name of the key identifying items.
+        """
+        positions = []
+        for data in datas:
+            key = data.get(id_field, None) if isinstance(data, dict) else None
+            if key is None:
+                # no identifier, can't be updated
+                key = ('position', len(self.datas))
+            position = self.keys.get(key, None)
+            if position is None:
+                position = self.keys[key] = len(self.datas)
+                self.datas.append(data)
+            else:
+                self.datas[position] = data
+            positions.append(position)
+        self._index.clear()
+        self._sorted.clear()
+        return positions
+
+    def index(self, field):
+        """
+        Return a dict of field value to list of positions, None if the field
+        isn't indexed, or if its values can't be hashed.
+
+        :param field: :py:class:`Field` object.
+        """
+        if field.name not in self.indexes or not field.pure:
+            return None
+        if field.name not in self._index:
+            index = dict()
+            try:
+                for position, data in enumerate(self.datas):
+                    index.setdefault(field.value(data), []).append(position)
+            except TypeError:
+                index = None
+            self._index[field.name] = index
+        return self._index[field.name]
+
+    def sorted(self, field):
+        """
+        Return a tuple of the sorted truthy values of a field and of their
+        positions, None if the field isn't indexed, or if its values can't be
+        sorted.
+
+        :param field: :py:class:`Field` object.
+        """
+        index = self.index(field)
+        if index is None:
+            return None
+        if field.name not in self._sorted:
+            try:
+                values = sorted(value for value in index if value)
+            except TypeError:
+                result = None
+            else:
+                result = (values, [index[value] for value in values])
+            self._sorted[field.name] = result
+        return self._sorted[field.name]
+
+    def candidates(self, expression):
+        """
+        Return the set of positions of items which may match an expression
+        given the indexes, None for all items.
+
+        :param expression: :py:class:`Expression` object.
+        """
+        if isinstance(expression, And):
+            result = None
+            for child in expression.expressions:
+                positions = self.candidates(child)
+                if positions is not None:
+                    if result is None:
+                        result = positions
+                    else:
+                        result &= positions
+            return result
+
+        if isinstance(expression, Or):
+            result = set()
+            for child in expression.expressions:
+                positions = self.candidates(child)
+                if positions is None:
+                    return None
+                result |= positions
+            return result
+
+        field = getattr(expression, 'field', None)
+        if not isinstance(field, Field):
+            return None
+
+        if type(expression) is Equal:
+            index = self.index(field)
+            if index is None:
+                return None
+            try:
+                return set(index.get(expression.value, ()))
+            except TypeError:
+                return None
+
+        if type(expression) in (LesserThan, GreaterThan):
+            values = self.sorted(field)
+            if values is None:
+                return None
+            values, positions = values
+            try:
+                if type(expression) is LesserThan:
+                    found = positions[:bisect.bisect_left(
+                        values,
+                        expression.value,
+                    )]
+                else:
+                    found = positions[bisect.bisect_right(
+                        values,
+                        expression.value,
+                    ):]
+            except TypeError:
+                return None
+            return {position for group in found for position in group}
+
+    def select(self, expression=None):
+        """
+        Return the list of raw data of items which may match an expression,
+        in collection order, using indexes.
+
+        :param expression: :py:class:`Expression` object.
+        """
+        positions = self.candidates(expression) if expression else None
+        if positions is None:
+            return self.datas
+        return [self.datas[position] for position in sorted(positions)]
+
+
+class CollectionStore:
+    """
+    In-memory snapshots of model collections for :py:attr:`Model.store`,
+    which answer :py:meth:`Model.find` locally.
+
+    A snapshot is fetched on first use, and synced again once expired by
+    :py:attr:`ttl`. If the model has a :py:attr:`Model.modified_since`
+    parameter, syncing only fetches the items modified since the last sync,
+    which can't know about deleted items: set :py:attr:`max_age` to fetch
+    everything again from time to time.
+
+    .. py:attribute:: ttl
+
+        Seconds during which a snapshot answers without any request, None to
+        sync only after :py:meth:`refresh`. Default: 60
+
+    .. py:attribute:: max_age
+
+        Seconds after which a snapshot is fetched entirely instead of
+        incrementally, None for never. Default: None
+
+    .. py:attribute:: indexes
+
+        Names of the fields to index, so that :py:class:`Equal`,
+        :py:class:`LesserThan` and :py:class:`GreaterThan` expressions on them
+        only evaluate the other expressions on matching items.
+    """
+    def __init__(self, ttl=60, max_age=None, indexes=None):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.indexes = indexes or []
+        self.collections = dict()
+        self.locks = collections.defaultdict(asyncio.Lock)
+
+    def key(self, paginator):
+        """
+        Return the snapshot key for a paginator, from its absolute URL and
+        parameters, and from a digest of the headers and cookies its client
+        would send, so that clients with other credentials don't share
+        snapshots.
+
+        :param paginator: :py:class:`Paginator` object.
+        """
+        request = paginator.client.client.build_request(
+            'GET',
+            paginator.url,
+            params=paginator.params,
+        )
+        digest = hashlib.sha256()
+        for name, value in sorted(request.headers.multi_items()):
+            digest.update(f'{name}: {value}\n'.encode())
+        return f'{request.url} {digest.hexdigest()}'
+
+    def get(self, key):
+        """
+        Return a :py:class:`Collection`, or None.
+
+        :param key: Snapshot key.
+        """
+        return self.collections.get(key, None)
+
+    def set(self, key, collection, positions=None):
+        """
+        Store a :py:class:`Collection`.
+
+        :param key: Snapshot key.
+        :param collection: :py:class:`Collection` object.
+        :param positions: Positions of the items that changed, None if
+                          the collection was fetched entirely.
+        """
+        self.collections[key] = collection
+
+    def refresh(self, key=None):
+        """
+        Drop snapshots, so that they're fetched again entirely on next use.
+
+        :param key: Snapshot key, drop all snapshots if None.
+        """
+        if key is None:
+            self.collections.clear()
+        else:
+            self.collections.pop(key, None)
+
+    def since(self, timestamp):
+        """
+        Return the value of the :py:attr:`Model.modified_since` parameter for
+        a timestamp, ISO 8601 in UTC by default.
+
+        :param timestamp: Timestamp of the last sync.
+        """
+        return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+    async def collection(self, paginator):
+        """
+        Return the :py:class:`Collection` for a paginator, synced if expired.
+
+        :param paginator: :py:class:`Paginator` object.
+        """
+        key = self.key(paginator)
+        async with self.locks[key]:
+            collection = self.get(key)
+            now = time.time()
+            if collection is not None and (
+                self.ttl is None or now - collection.synced < self.ttl
+            ):
+                return collection
+
+            since = getattr(paginator.model, 'modified_since', None)
+            params = dict()
+            if collection is not None and since and (
+                self.max_age is None
+                or now - collection.refreshed < self.max_age
+            ):
+                params[since] = self.since(collection.synced)
+            else:
+                collection = Collection(self.indexes)
+                collection.refreshed = now
+
+            id_field = getattr(paginator.model, 'id_field', 'id')
+            positions = collection.update(
+                await paginator.fetch(params),
+                id_field,
+            )
+            collection.synced = now
+            self.set(key, collection, positions if params else None)
+            return collection
+
+
+class SQLiteCollectionStore(CollectionStore):
+    """
+    :py:class:`CollectionStore` saved in an SQLite database, to reuse
+    snapshots between runs, ie. of a CLI. Snapshots are loaded in memory on
+    first use, where they are indexed.
+
+    .. py:attribute:: path
+
+        Path to the database file, default:
+        ``~/.local/cli2/collections.sqlite``
+    """
+    def __init__(self, path=None, **kwargs):
+        super().__init__(**kwargs)
+        if path is None:
+            path = Path(os.getenv('HOME')) / '.local/cli2/collections.sqlite'
+        self.path = Path(path)
+        self._connection = None
+
+    @property
+    def connection(self):
+        if not self._connection:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path)
+            self._connection.executescript('''
+                CREATE TABLE IF NOT EXISTS collections (
+                    key TEXT PRIMARY KEY,
+                    synced REAL,
+                    refreshed REAL
+                );
+                CREATE TABLE IF NOT EXISTS items (
+                    collection TEXT,
+                    position INTEGER,
+                    id TEXT,
+                    data TEXT,
+                    PRIMARY KEY (collection, position)
+                );
+            ''')
+        return self._connection
+
+    def get(self, key):
+        collection = super().get(key)
+        if collection is not None:
+            return collection
+
+        row = self.connection.execute(
+            'SELECT synced, refreshed FROM collections WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if not row:
+            return None
+        items = self.connection.execute(
+            'SELECT id, data FROM items WHERE collection = ?'
+            ' ORDER BY position',
+            (key,),
+        )
+        collection = Collection(self.indexes)
+        collection.synced, collection.refreshed = row
+        for position, (id, data) in enumerate(items):
+            id = ('position', position) if id is None else json.loads(id)
+            collection.keys[id] = position
+            collection.datas.append(json.loads(data))
+        self.collections[key] = collection
+        return collection
+
+    def set(self, key, collection, positions=None):
+        super().set(key, collection, positions)
+        with self.connection:
+            if positions is None:
+                self.connection.execute(
+                    'DELETE FROM items WHERE collection = ?',
+                    (key,),
+                )
+                positions = range(len(collection.datas))
+            ids = {
+                position: None if isinstance(id, tuple) else json.dumps(id)
+                for id, position in collection.keys.items()
+            }
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)',
+                [
+                    (
+                        key,
+                        position,
+                        ids[position],
+                        json.dumps(collection.datas[position]),
+                    )
+                    for position in positions
+                ],
+            )
+            self.connection.execute(
+                'INSERT OR REPLACE INTO collections VALUES (?, ?, ?)',
+                (key, collection.synced, collection.refreshed),
+            )
+
+    def refresh(self, key=None):
+        super().refresh(key)
+        with self.connection:
+            if key is None:
+                self.connection.execute('DELETE FROM collections')
+                self.connection.execute('DELETE FROM items')
+            else:
+                self.connection.execute(
+                    'DELETE FROM collections WHERE key = ?',
+                    (key,),
+                )
+                self.connection.execute(
+                    'DELETE FROM items WHERE collection = ?',
+                    (key,),
+                )
+
+
+class PoolMetrics:
+    """
+    Connection pool metrics of a :py:class:`Client`.
+
+    A request is waiting from the moment it's handed to httpx until it gets a
+    connection from the pool. If waits grow, then you need more
+    :py:attr:`Client.max_connections`, or :py:attr:`Client.http2`.
+
+    .. py:attribute:: requests
+
+        Number of requests sent.
+
+    .. py:attribute:: waiting
+
+        Number of requests currently waiting for a connection.
+
+    .. py:attribute:: waiting_max
+
+        Highest number of requests that waited for a connection at once.
 
+    .. py:attribute:: wait_total
 
-class ClientCommand(Command):
-    """
-    Client CLI command
+        Total seconds spent waiting for connections.
 
-    .. py:attribute:: client
+    .. py:attribute:: wait_max
 
-        The client object that was constructed from :py:meth:`Client.factory`
+        Longest wait for a connection, in seconds.
     """
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.client = None
+    def __init__(self):
+        self.requests = 0
+        self.waiting = 0
+        self.waiting_max = 0
+        self.wait_total = 0
+        self.wait_max = 0
 
-    def setargs(self):
-        """
-        Set a `self` factory of :py:meth:`Client.factory` method, and call
-        :py:meth:`Client.setargs`.
+    @property
+    def wait_average(self):
+        """ Average wait for a connection, in seconds. """
+        return self.wait_total / self.requests if self.requests else 0
+
+    def start(self):
+        """ Count a request waiting for a connection, return start time. """
+        self.requests += 1
+        self.waiting += 1
+        self.waiting_max = max(self.waiting, self.waiting_max)
+        return time.monotonic()
+
+    def stop(self, start):
         """
-        super().setargs()
-        if 'self' in self:
-            self['self'].factory = self.client_class.factory
-        self.client_class.setargs(self)
-
-    async def factories_resolve(self):
-        """ Set :py:attr:`client` after resolving factories. """
-        await super().factories_resolve()
-        if 'self' in self:
-            self.client = self['self'].value
+        Count a request that got a connection, return the seconds it waited.
 
-    async def post_call(self):
-        """ Call :py:meth:`Client.post_call`. """
-        if self.client:
-            await self.client.post_call(self)
+        :param start: Return value of :py:meth:`start`.
+        """
+        wait = time.monotonic() - start
+        self.waiting -= 1
+        self.wait_total += wait
+        self.wait_max = max(wait, self.wait_max)
+        return wait
+
+    def __repr__(self):
+        return (
+            f'PoolMetrics(requests={self.requests}, waiting={self.waiting}, '
+            f'waiting_max={self.waiting_max}, '
+            f'wait_average={self.wait_average:.3f}, '
+            f'wait_max={self.wait_max:.3f})'
+        )
 
 
 class Client(metaclass=ClientMetaclass):
@@ -1447,6 +3696,11 @@ class Client(metaclass=ClientMetaclass):
 
         Optionnal asyncio semaphore to throttle requests.
 
+    .. py:attribute:: concurrency
+
+        Optionnal maximum number of concurrent requests, creates the
+        :py:attr:`semaphore` if there's none, and sizes the connection pool.
+
     .. py:attribute:: handler
 
         A callback that will take responses objects and decide wether or not to
@@ -1492,31 +3746,165 @@ class Client(metaclass=ClientMetaclass):
 
     .. py:attribute:: mask
 
-        :py:class:`~cli2.mask.Mask` object
+        :py:class:`~cli2.mask.Mask` object, it learns the values of
+        :py:attr:`mask_keys` from the ``json`` and ``data`` of requests, and
+        from response bodies only when they are logged at DEBUG level.
 
     .. py:attribute:: models
 
         Declared models for this Client.
+
+    .. py:attribute:: http2
+
+        Enable HTTP/2, to multiplex concurrent requests over few connections,
+        requires the ``h2`` package. Default: False
+
+    .. py:attribute:: max_connections
+
+        Maximum number of connections in the pool. Defaults to
+        :py:attr:`concurrency` if any, otherwise 100.
+
+    .. py:attribute:: max_keepalive_connections
+
+        Maximum number of idle connections to keep in the pool. Defaults to
+        :py:attr:`concurrency` if any, otherwise 20.
+
+    .. py:attribute:: keepalive_expiry
+
+        Seconds to keep idle connections. Default: 5
+
+    .. py:attribute:: pool_metrics
+
+        :py:class:`PoolMetrics` object.
+
+    .. py:attribute:: pool_wait_log
+
+        Add the pool wait in seconds to the response log when it's more than
+        this. Default: .1
+
+    .. py:attribute:: json_codec
+
+        :py:class:`JSONCodec` to encode request bodies and decode responses
+        with, ``response.json()`` is also cached per response.
+
+    .. py:attribute:: cache
+
+        Optionnal :py:class:`ResponseCache` or :py:class:`FileResponseCache`
+        for GET requests.
+
+    .. py:attribute:: limiter
+
+        Optionnal :py:class:`RateLimiter`, to throttle requests per host
+        adaptively:
+
+        .. code-block:: python
+
+            class YourClient(chttpx.Client):
+                limiter = chttpx.RateLimiter(rate=10)
+
+    .. py:attribute:: retry_budget
+
+        Optionnal :py:class:`RetryBudget`, to cap retries of all requests.
+
+    .. py:attribute:: breaker
+
+        Optionnal :py:class:`CircuitBreaker`, to fail fast on hosts with a
+        high error rate.
+
+    .. py:attribute:: operators
+
+        Optionnal dict of operator names to GET parameter translations of
+        this API, for fields with a :py:attr:`Field.parameter`. Translations
+        are either format strings with a ``{parameter}`` key, or callables
+        which take the parameter and the value and return a dict of GET
+        parameters:
+
+        .. code-block:: python
+
+            class YourClient(chttpx.Client):
+                operators = {
+                    'gt': '{parameter}__gt',
+                    'lt': '{parameter}__lt',
+                    'startswith': '{parameter}__startswith',
+                    'in': lambda parameter, value: {
+                        f'{parameter}__in': ','.join(value),
+                    },
+                }
+
+    .. py:attribute:: token_expires
+
+        Timestamp at which :py:attr:`token` expires, you may set it in
+        :py:meth:`token_get` to have tokens refreshed ahead of expiry.
+
+    .. py:attribute:: token_expiry_margin
+
+        Seconds before :py:attr:`token_expires` from which requests start a
+        token refresh in the background, without waiting for it.
+        Default: 60
     """
     paginator = Paginator
     models = []
     semaphore = None
+    concurrency = None
     debug = False
     cmdclass = ClientCommand
     mask_keys = None
-
-    def __init__(self, *args, handler=None, semaphore=None, mask=None,
-                 debug=False, **kwargs):
+    http2 = False
+    max_connections = None
+    max_keepalive_connections = None
+    keepalive_expiry = 5
+    pool_wait_log = .1
+    json_codec = JSONCodec()
+    cache = None
+    limiter = None
+    retry_budget = None
+    breaker = None
+    operators = None
+    token_expires = None
+    token_expiry_margin = 60
+
+    def __init__(self, *args, handler=None, semaphore=None, concurrency=None,
+                 mask=None, debug=False, http2=None, max_connections=None,
+                 max_keepalive_connections=None, keepalive_expiry=None,
+                 limiter=None, retry_budget=None, breaker=None, cache=None,
+                 **kwargs):
         """
         Instanciate a client with httpx.AsyncClient args and kwargs.
+
+        Connection pool options default to the class attributes.
         """
         self._client = None
         self._client_args = args
         self._client_kwargs = kwargs
         self._client_attrs = None
+        self._client_requests = dict()
+        self._client_tasks = set()
 
         self.handler = handler or Handler()
         self.semaphore = semaphore if semaphore else self.semaphore
+        self.concurrency = concurrency if concurrency else self.concurrency
+        if self.concurrency and not self.semaphore:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.limiter = limiter if limiter else self.limiter
+        self.cache = cache if cache else self.cache
+        self.retry_budget = retry_budget if retry_budget else self.retry_budget
+        self.breaker = breaker if breaker else self.breaker
+
+        if http2 is not None:
+            self.http2 = http2
+        if keepalive_expiry is not None:
+            self.keepalive_expiry = keepalive_expiry
+        # so that requests don't queue in the pool
+        self.max_connections = (
+            max_connections or self.max_connections or self.concurrency or 100
+        )
+        self.max_keepalive_connections = (
+            max_keepalive_connections
+            or self.max_keepalive_connections
+            or self.concurrency
+            or 20
+        )
+        self.pool_metrics = PoolMetrics()
         self.mask = mask or Mask()
         if self.mask_keys:
             for key in self.mask_keys:
@@ -1532,11 +3920,14 @@ class Client(metaclass=ClientMetaclass):
 
         self.token_getting = False
         self.token = None
+        self._token_task = None
 
         for model in self.models:
             model = type(model.__name__, (model,), dict(client=self))
             if model.url_list:
                 model.url_list = model.url_list.format(client=self)
+            if model.url_bulk:
+                model.url_bulk = model.url_bulk.format(client=self)
             setattr(self, model.__name__, model)
 
     @classmethod
@@ -1575,8 +3966,20 @@ class Client(metaclass=ClientMetaclass):
     def client_factory(self):
         """
         Return a fresh httpx async client instance.
+
+        Pool options apply unless ``limits`` or ``http2`` are in the kwargs
+        the client was instanciated with.
         """
-        client = httpx.AsyncClient(*self._client_args, **self._client_kwargs)
+        kwargs = dict(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            http2=self.http2,
+        )
+        kwargs.update(self._client_kwargs)
+        client = httpx.AsyncClient(*self._client_args, **kwargs)
         if self.token and not self.token_getting:
             try:
                 self.client_token_apply(client)
@@ -1593,32 +3996,143 @@ class Client(metaclass=ClientMetaclass):
         self._client = None
 
     async def send(self, request, handler, retries=True, semaphore=None,
-                   log=None, quiet=None, auth=None, follow_redirects=None):
+                   log=None, quiet=None, auth=None, follow_redirects=None,
+                   stream=False):
         """
         Internal request method
         """
         semaphore = semaphore or self.semaphore
         tries = 0
 
+        def _release(response, callback):
+            # streamed bodies still use the resources until they're closed
+            if stream and not response.is_closed:
+                response.stream = _ClosingStream(response.stream, callback)
+            else:
+                callback()
+
         async def _send():
-            return await self.client.send(
-                request,
-                auth=auth,
-                follow_redirects=follow_redirects,
+            client = self.client
+            self._client_requests[client] = (
+                self._client_requests.get(client, 0) + 1
+            )
+
+            def release():
+                self._client_requests[client] -= 1
+                if not self._client_requests[client]:
+                    del self._client_requests[client]
+                    if client is not self._client:
+                        self._client_close(client)
+
+            try:
+                response = await _client_send(client)
+            except httpx.TransportError as exc:
+                # so that client_reset() knows which client failed
+                exc.httpx_client = client
+                release()
+                raise
+            except BaseException:
+                release()
+                raise
+            _release(response, release)
+            return response
+
+        async def _client_send(client):
+            token = self.token
+            start = self.pool_metrics.start()
+            wait = None
+            trace = request.extensions.get('trace', None)
+
+            async def _trace(name, info):
+                # the first event happens once we have a connection
+                nonlocal wait
+                if wait is None:
+                    wait = self.pool_metrics.stop(start)
+                if trace:
+                    await trace(name, info)
+
+            request.extensions['trace'] = _trace
+            try:
+                response = await client.send(
+                    request,
+                    auth=auth,
+                    follow_redirects=follow_redirects,
+                    stream=stream,
+                )
+            finally:
+                request.extensions['trace'] = trace
+                if trace is None:
+                    del request.extensions['trace']
+                if wait is None:
+                    # transport without trace events, ie. mocks
+                    wait = self.pool_metrics.stop(start)
+            response.extensions['pool_wait'] = wait
+            # so that token_reset() knows which token was refused
+            response.extensions['token'] = token
+            # decode only once, with our codec
+            response.json = functools.partial(self.response_json, response)
+            return response
+
+        async def _guarded():
+            if not self.breaker:
+                return await _send()
+            self.breaker.check(request)
+            try:
+                response = await _send()
+            except Exception as exc:
+                self.breaker.record(request, exc)
+                raise
+            except BaseException:
+                # cancelled, no outcome
+                self.breaker.cancel(request)
+                raise
+            self.breaker.record(request, response)
+            return response
+
+        async def _limited():
+            if not self.limiter:
+                return await _guarded()
+            await self.limiter.acquire(request)
+            try:
+                response = await _guarded()
+            except BaseException:
+                self.limiter.release(request)
+                raise
+            _release(
+                response,
+                functools.partial(self.limiter.release, request, response),
             )
+            return response
 
         async def _request():
-            if semaphore:
-                async with semaphore:
-                    return await _send()
-            return await _send()
-
-        _log = log.bind(
-            method=request.method,
-            url=str(request.url),
-            chttpx_id=str(uuid.uuid4()),
-        )
-        if not quiet or self.debug:
+            if not semaphore:
+                return await _limited()
+            await semaphore.acquire()
+            try:
+                response = await _limited()
+            except BaseException:
+                semaphore.release()
+                raise
+            _release(response, semaphore.release)
+            return response
+
+        async def _cached():
+            if not self.cache or stream or request.method != 'GET':
+                return await _request()
+            response = await self.cache.send(request, _request)
+            if response.extensions['cache'] != 'miss':
+                response.json = functools.partial(self.response_json, response)
+            return response
+
+        # don't bind, read or parse anything for logs that nothing would write
+        _log = None
+        if log_enabled(logging.INFO):
+            _log = log.bind(
+                method=request.method,
+                url=str(request.url),
+                chttpx_id=str(uuid.uuid4()),
+            )
+        if _log and (not quiet or self.debug) and log_enabled(logging.DEBUG):
             # ensure we have content to log
             await request.aread()
 
@@ -1631,35 +4145,101 @@ class Client(metaclass=ClientMetaclass):
                 kwargs['headers'] = request.headers
             _log.debug('request', **kwargs)
 
+        if self.retry_budget:
+            self.retry_budget.deposit()
+
         while retries or tries > 1:
             try:
-                response = await _request()
+                response = await _cached()
             except Exception as exc:
                 await handler(self, exc, tries, log)
             else:
-                kwargs = dict(status_code=response.status_code)
-                if not quiet or self.debug:
-                    key, value = self.response_log_data(response)
-                    if value:
-                        kwargs[key] = value
+                if stream and not response.is_success:
+                    # error bodies are small, read them for logs and errors
+                    await response.aread()
 
-                _log.info('response', **kwargs)
+                if _log:
+                    self.response_log(_log, response, quiet)
 
-                if response := await handler(self, response, tries, log):
-                    return response
+                if accepted := await handler(self, response, tries, log):
+                    return accepted
+                if stream:
+                    await response.aclose()
 
             tries += 1
 
         return response
 
-    async def client_reset(self):
-        del self.client
+    async def client_reset(self, client=None):
+        """
+        Replace the httpx client, ie. after a TransportError.
+
+        The next request gets a new client right away, while the old one is
+        closed in the background once its in-flight requests are done.
+        Concurrent resets for the same failing client only replace it once.
+
+        :param client: The httpx client that failed, if it was already
+                       replaced then this does nothing.
+        """
+        old = self._client
+        if old is None or (client is not None and client is not old):
+            return
+        self._client = None
+        if old not in self._client_requests:
+            self._client_close(old)
+
+    def _client_close(self, client):
+        if 'transport' in self._client_kwargs:
+            # the transport is shared with the new client
+            return
+        task = asyncio.create_task(client.aclose())
+        self._client_tasks.add(task)
+        task.add_done_callback(self._client_tasks.discard)
+
+    async def token_reset(self, token=None):
+        """
+        Forget the token, so that the next request gets a new one.
 
-    async def token_reset(self):
+        :param token: The token that was refused, if the token was already
+                      refreshed since then, this does nothing.
+        """
+        if token is not None and token != self.token:
+            return
         self.token = None
 
+    def token_expired(self, margin=0):
+        """
+        Return True if :py:attr:`token_expires` is in less than margin.
+
+        :param margin: Number of seconds.
+        """
+        if not self.token_expires:
+            return False
+        return time.time() + margin >= self.token_expires
+
     async def token_refresh(self):
-        """ Use :py:meth:`token_get()` to get a token """
+        """
+        Use :py:meth:`token_get()` to get a token.
+
+        Concurrent calls wait for the same :py:meth:`token_get()` call.
+        """
+        await asyncio.shield(self._token_refresh_start())
+
+    def _token_refresh_start(self):
+        if not self._token_task:
+            self._token_task = asyncio.create_task(self._token_refresh())
+            self._token_task.add_done_callback(self._token_refresh_done)
+        return self._token_task
+
+    def _token_refresh_done(self, task):
+        self._token_task = None
+        if not task.cancelled():
+            # retrieve the exception, for background refreshes
+            task.exception()
+
+    async def _token_refresh(self):
+        # requests made by token_get() must not wait for themselves
+        _token_getting.set(self)
         self.token_getting = True
         try:
             self.token = await self.token_get()
@@ -1670,7 +4250,8 @@ class Client(metaclass=ClientMetaclass):
                 self.client_token_apply(self.client)
             except NotImplementedError:
                 pass
-        self.token_getting = False
+        finally:
+            self.token_getting = False
 
     def client_token_apply(self, client):
         """
@@ -1725,7 +4306,7 @@ class Client(metaclass=ClientMetaclass):
         *,
         # cli2 arguments
         handler=None, quiet=False, accepts=None, refuses=None, tries=None,
-        backoff=None, retries=True, semaphore=None, mask=None,
+        backoff=None, retries=True, semaphore=None, mask=None, stream=False,
         # httpx arguments
         content=None, data=None, files=None, json=None, params=None,
         headers=None, cookies=None, auth=httpx.USE_CLIENT_DEFAULT,
@@ -1736,7 +4317,8 @@ class Client(metaclass=ClientMetaclass):
         Request method
 
         If your client defines a token_get callable, then it will
-        automatically play it.
+        automatically play it, concurrent requests wait for the same
+        :py:meth:`token_refresh`.
 
         If your client defines an asyncio semaphore, it will respect it.
 
@@ -1779,9 +4361,14 @@ class Client(metaclass=ClientMetaclass):
         :param tries: Override for :py:attr:`Handler.tries`
         :param backoff: Override for :py:attr:`Handler.backoff`
         :param semaphore: Override for :py:attr:`Client.semaphore`
+        :param stream: Return the response without reading its body, you
+                       have to close it then, prefer :py:meth:`stream`.
         """
-        if not self.token and not self.token_getting:
-            await self.token_refresh()
+        if _token_getting.get() is not self:
+            if not self.token or self.token_expired():
+                await self.token_refresh()
+            elif self.token_expired(self.token_expiry_margin):
+                self._token_refresh_start()
 
         if not accepts and os.getenv('STRICT'):
             raise Exception('Accepts not set')
@@ -1801,6 +4388,18 @@ class Client(metaclass=ClientMetaclass):
             else:
                 handler = self.handler
 
+        if self.mask.keys:
+            # learn secrets even if nothing logs the request
+            for value in (json, data):
+                if value is not None:
+                    self.mask.learn(value)
+
+        if json is not None and content is None:
+            content = self.json_codec.dumps(json)
+            json = None
+            headers = httpx.Headers(headers)
+            headers.setdefault('content-type', 'application/json')
+
         request = self.client.build_request(
             method=method,
             url=url,
@@ -1824,11 +4423,100 @@ class Client(metaclass=ClientMetaclass):
             quiet=quiet,
             auth=auth,
             follow_redirects=follow_redirects,
+            stream=stream,
         )
 
         return response
 
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """
+        Context manager for a request which body is read while iterating.
+
+        .. code-block:: python
+
+            async with client.stream('GET', '/huge') as response:
+                async for chunk in response.aiter_bytes():
+                    print(chunk)
+
+        :param method: HTTP Method name, GET, POST, etc
+        :param url: URL to query
+        :param kwargs: Any :py:meth:`request` kwargs
+        """
+        response = await self.request(method, url, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    def response_log(self, log, response, quiet=False):
+        """
+        Log a response.
+
+        :param log: Bound logger.
+        :param response: httpx Response.
+        :param quiet: Don't log the response content.
+        """
+        kwargs = dict(status_code=response.status_code)
+        wait = response.extensions.get('pool_wait', 0)
+        if wait > self.pool_wait_log:
+            kwargs['pool_wait'] = round(wait, 3)
+        if 'cache' in response.extensions:
+            kwargs['cache'] = response.extensions['cache']
+            kwargs['cache_hits'] = self.cache.hits
+            kwargs['cache_misses'] = self.cache.misses
+        if not quiet or self.debug:
+            key, value = self.response_log_data(response)
+            if value:
+                kwargs[key] = value
+        log.info('response', **kwargs)
+
+    def response_json(self, response, **kwargs):
+        """
+        Decode a response body with :py:attr:`json_codec`.
+
+        The decoded data is cached in the response, so it's parsed once
+        however many times ``response.json()`` is called: don't mutate it,
+        use :py:meth:`response_data` instead.
+
+        :param response: httpx Response.
+        :param kwargs: json.loads kwargs, skip the codec and cache if any.
+        """
+        if kwargs:
+            return json.loads(response.content, **kwargs)
+
+        if 'json' not in response.extensions:
+            try:
+                response.extensions['json'] = self.json_codec.loads(
+                    response.content
+                )
+            except ValueError as exc:
+                response.extensions['json'] = exc
+        data = response.extensions['json']
+        if isinstance(data, ValueError):
+            raise data
+        return data
+
+    def response_data(self, response):
+        """
+        Return the decoded body of a response for the caller to keep and
+        mutate, ie. as :py:attr:`Model.data`: the data cached by
+        :py:meth:`response_json` is handed over and dropped from the cache, so
+        that ``response.json()`` doesn't return mutated data.
+
+        :param response: httpx Response.
+        """
+        data = self.response_json(response)
+        response.extensions.pop('json', None)
+        return data
+
     def response_log_data(self, response):
+        try:
+            response.content
+        except httpx.ResponseNotRead:
+            # streamed response
+            return None, None
+
         try:
             data = response.json()
         except:  # noqa
@@ -1845,7 +4533,7 @@ class Client(metaclass=ClientMetaclass):
             return None, None
 
         try:
-            data = json.loads(content)
+            data = self.json_codec.loads(content)
         except:  # noqa
             pass
         else:
@@ -1914,20 +4602,174 @@ class Client(metaclass=ClientMetaclass):
         """ DELETE Request """
         return await self.request('DELETE', url, *args, **kwargs)
 
+    def batch(self, concurrency=None):
+        """
+        Return a :py:class:`Batch` to run many requests with bounded
+        concurrency, without aborting on errors.
+
+        :param concurrency: Override for :py:attr:`Batch.concurrency`.
+        """
+        return Batch(concurrency)
+
     def paginate(self, url, *expressions, params=None, model=None,
-                 callback=None):
+                 callback=None, stream=False):
         """
         Return a paginator to iterate over results
 
         :param url: URL to paginate on
         :param params: GET parameters
         :param model: Model class to cast for items
+        :param stream: True to stream a JSON list response, or the key of the
+                       list in a JSON object, see :py:meth:`Paginator.stream`
+        """
+        paginator = self.paginator(self, url, params or {}, model or dict,
+                                   expressions, callback)
+        if stream:
+            paginator = paginator.stream(None if stream is True else stream)
+        return paginator
+
+
+class Plan:
+    """
+    Split of expressions between the server and Python, returned by
+    :py:meth:`Paginator.plan`.
+
+    .. py:attribute:: params
+
+        Dict of GET parameters that the expressions were translated to.
+
+    .. py:attribute:: pushed
+
+        List of expressions converted to :py:attr:`params`.
+
+    .. py:attribute:: residuals
+
+        List of expressions to evaluate in Python.
+
+    .. py:attribute:: residual
+
+        :py:class:`And` of :py:attr:`residuals`, None if there are none.
+    """
+    def __init__(self, params=None):
+        """
+        :param params: Base GET parameters, expressions translating to any
+                       of them are evaluated in Python instead of
+                       overriding them.
+        """
+        self.base = params or {}
+        self.params = dict()
+        self.pushed = []
+        self.residuals = []
+
+    def add(self, expression, translate):
+        """
+        Push an expression, and nested :py:class:`And` children, to
+        :py:attr:`params` if possible, otherwise to :py:attr:`residuals`.
+
+        :param expression: :py:class:`Expression` object
+        :param translate: Callable returning the GET parameters for an
+                          expression, or None, ie.
+                          :py:meth:`Paginator.translate`.
+        """
+        if isinstance(expression, And):
+            for child in expression.expressions:
+                self.add(child, translate)
+            return
+
+        params = translate(expression)
+        if params and not any(
+            key in self.base or key in self.params for key in params
+        ):
+            self.params.update(params)
+            self.pushed.append(expression)
+        else:
+            self.residuals.append(expression)
+
+    @property
+    def residual(self):
+        if self.residuals:
+            return And(*self.residuals)
+
+
+class _Compiler:
+    """
+    Generate a Python function evaluating an expression tree, see
+    :py:meth:`Expression.matcher`.
+    """
+    def __init__(self, raw, item, getter):
+        """
+        :param raw: Wether fields are read from raw data, with
+                    :py:meth:`Field.value` if they're pure.
+        :param item: Source of the model object.
+        :param getter: Source of a callable returning the model object.
+        """
+        self.raw = raw
+        self.item = item
+        self.getter = getter
+        self.namespace = dict()
+        self.count = 0
+        self.data = False
+
+    def name(self, prefix='_'):
+        """ Return a new variable name. """
+        self.count += 1
+        return f'{prefix}{self.count}'
+
+    def const(self, value):
+        """ Return the name of a new variable holding a value. """
+        name = self.name('c')
+        self.namespace[name] = value
+        return name
+
+    @staticmethod
+    def key(field):
+        """ Return the key of a plain field which reads a single key. """
+        cls = type(field)
+        if (
+            cls.get is Field.get
+            and cls.value is Field.value
+            and cls.externalize is Field.externalize
+            and field.pure
+            and len(field.path) == 1
+        ):
+            return field.path[0]
+
+    def value(self, field):
+        """ Return the source of the external value of a field. """
+        key = self.key(field)
+        if key is not None:
+            self.data = True
+            return f'data.get({key!r})'
+        if self.raw and field.pure:
+            return f'{self.const(field.value)}(data)'
+        return f'{self.const(field)}.__get__({self.item})'
+
+    def function(self, signature, body, result):
         """
-        return self.paginator(self, url, params or {}, model or dict,
-                              expressions, callback)
+        Define a function and return it.
+
+        :param signature: Arguments source.
+        :param body: List of lines of source.
+        :param result: Source of the return value.
+        """
+        source = '\n    '.join([f'def compiled({signature}):', *body])
+        exec(f'{source}\n    return {result}\n', self.namespace)
+        return self.namespace['compiled']
 
 
 class Expression:
+    """
+    Base class for expressions.
+
+    .. py:attribute:: operator
+
+        Name of the operator, to look up in :py:attr:`Field.parameters` and
+        :py:attr:`Client.operators`, None if the expression can't be
+        translated to GET parameters that way.
+    """
+    operator = None
+    symbol = None
+
     def __init__(self, field, value):
         self.field = field
         self.value = value
@@ -1945,13 +4787,94 @@ class Expression:
     def __str__(self):
         return self.compile()
 
+    def __repr__(self):
+        name = getattr(self.field, 'name', self.field.data_accessor)
+        return f'{name} {self.symbol} {self.value!r}'
+
+    def matches(self, item):
+        return self.test(self.field.__get__(item))
+
+    def matches_data(self, data, item):
+        """
+        Evaluate on raw model data, using :py:meth:`Field.value` if the field
+        is :py:attr:`~Field.pure`.
+
+        :param data: Raw model data dict.
+        :param item: Callable returning the model object otherwise.
+        """
+        if self.field.pure:
+            return self.test(self.field.value(data))
+        return self.matches(item())
+
+    def source(self, compiler):
+        """
+        Return the Python source of this expression for a
+        :py:meth:`matcher` function, calls :py:meth:`matches` or
+        :py:meth:`matches_data` by default.
+
+        :param compiler: Object with the ``value(field)`` and
+                         ``const(value)`` methods returning sources of a
+                         field value and of any value.
+        """
+        if compiler.raw:
+            method = compiler.const(self.matches_data)
+            return f'{method}(data, {compiler.getter})'
+        return f'{compiler.const(self.matches)}({compiler.item})'
+
+    def matcher(self):
+        """
+        Return a function that evaluates this expression on a model object
+        like :py:meth:`matches`, generated as a single Python function which
+        reads the data of plain fields directly, instead of calling methods
+        for each expression and field.
+        """
+        compiler = _Compiler(raw=False, item='item', getter='(lambda: item)')
+        result = f'bool({self.source(compiler)})'
+        body = ['data = item.data'] if compiler.data else []
+        return compiler.function('item', body, result)
+
+    def matcher_data(self):
+        """
+        Return a function of raw model data and of a callable returning the
+        model object, that evaluates this expression like
+        :py:meth:`matches_data`, see :py:meth:`matcher`.
+        """
+        compiler = _Compiler(raw=True, item='item()', getter='item')
+        result = f'bool({self.source(compiler)})'
+        return compiler.function('data, item', [], result)
+
+    def matcher_page(self):
+        """
+        Return a function of a list of raw model data and of a callable
+        returning the model object at an index, that returns the list of
+        indexes of matching items in a single comprehension, see
+        :py:meth:`matcher`.
+        """
+        compiler = _Compiler(
+            raw=True,
+            item='item(index)',
+            getter='(lambda: item(index))',
+        )
+        result = ' '.join([
+            '[index for index, data in enumerate(datas)',
+            f'if {self.source(compiler)}]',
+        ])
+        return compiler.function('datas, item', [], result)
+
 
 class Equal(Expression):
+    operator = 'eq'
+    symbol = '=='
+
     def params(self, params):
         params[self.field.parameter] = self.value
 
-    def matches(self, item):
-        return self.field.__get__(item) == self.value
+    def test(self, value):
+        return value == self.value
+
+    def source(self, compiler):
+        value = compiler.value(self.field)
+        return f'({value} == {compiler.const(self.value)})'
 
 
 class Filter(Expression):
@@ -1960,51 +4883,111 @@ class Filter(Expression):
         # This filter works with Python functions
         self.parameterable = False
 
+    def __repr__(self):
+        return getattr(self.function, '__name__', repr(self.function))
+
     def matches(self, item):
         return self.function(item)
 
+    def matches_data(self, data, item):
+        return self.matches(item())
+
+    def source(self, compiler):
+        return f'{compiler.const(self.function)}({compiler.item})'
+
 
 class LesserThan(Expression):
-    def matches(self, item):
-        value = self.field.__get__(item)
+    operator = 'lt'
+    symbol = '<'
+
+    def test(self, value):
         if not value:
             return False
         return value < self.value
 
+    def source(self, compiler):
+        name = compiler.name()
+        value = compiler.value(self.field)
+        const = compiler.const(self.value)
+        return f'(({name} := {value}) and {name} < {const})'
+
 
 class GreaterThan(Expression):
-    def matches(self, item):
-        value = self.field.__get__(item)
+    operator = 'gt'
+    symbol = '>'
+
+    def test(self, value):
         if not value:
             return False
         return value > self.value
 
+    def source(self, compiler):
+        name = compiler.name()
+        value = compiler.value(self.field)
+        const = compiler.const(self.value)
+        return f'(({name} := {value}) and {name} > {const})'
+
 
 class StartsWith(Expression):
-    def matches(self, item):
-        value = self.field.__get__(item)
+    operator = 'startswith'
+    symbol = 'startswith'
+
+    def test(self, value):
         if not value:
             return False
         return str(value).startswith(self.value)
 
+    def source(self, compiler):
+        name = compiler.name()
+        value = compiler.value(self.field)
+        const = compiler.const(self.value)
+        return f'(({name} := {value}) and str({name}).startswith({const}))'
+
 
 class Expressions(Expression):
     def __init__(self, *expressions):
         self.expressions = expressions
         self.parameterable = all(exp.parameterable for exp in expressions)
 
+    def __repr__(self):
+        return '(' + f' {self.symbol} '.join(map(repr, self.expressions)) + ')'
+
+    def source(self, compiler):
+        if not self.expressions:
+            return repr(self.empty)
+        sources = [exp.source(compiler) for exp in self.expressions]
+        return '(' + f' {self.symbol} '.join(sources) + ')'
+
 
 class Or(Expressions):
+    symbol = 'or'
+    empty = False
+
     def matches(self, value):
         for exp in self.expressions:
             if exp.matches(value):
                 return True
         return False
 
+    def matches_data(self, data, item):
+        for exp in self.expressions:
+            if exp.matches_data(data, item):
+                return True
+        return False
+
 
 class And(Expressions):
+    symbol = 'and'
+    empty = True
+
     def matches(self, value):
         for exp in self.expressions:
             if not exp.matches(value):
                 return False
         return True
+
+    def matches_data(self, data, item):
+        for exp in self.expressions:
+            if not exp.matches_data(data, item):
+                return False
+        return True
@@ -89,8 +89,11 @@ class Fixture:
                 f.write(yaml.dump(data))
 
     def parse(self, data):
+        return self.transactions(cli2.parse(data))
+
+    def transactions(self, entries):
         transactions = dict()
-        for entry in cli2.parse(data):
+        for entry in entries:
             if entry['event'] == 'request':
                 transactions[entry['chttpx_id']] = dict(request=entry)
             elif entry['event'] == 'response':
@@ -98,8 +101,7 @@ class Fixture:
         return [*transactions.values()]
 
     def load(self, log):
-        with log.open('r') as f:
-            self.requests = self.parse(f.read())
+        self.requests = self.transactions(cli2.iter_entries(log))
 
 
 @pytest.fixture
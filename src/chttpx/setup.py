@@ -11,6 +11,9 @@ setup(
         'httpx<1',
         'truststore',
     ],
+    extras_require=dict(
+        fast=['orjson', 'ijson'],
+    ),
     author='James Pic',
     author_email='jamespic@gmail.com',
     url='https://yourlabs.io/oss/cli2',
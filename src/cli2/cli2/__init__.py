@@ -1,54 +1,82 @@
 # flake8: noqa
+import importlib
+import os
+import sys
 
 from .configuration import Configuration, cfg
 cfg.defaults['CLI2_TRACEBACK_DISABLE'] = ''
 
-from .cli import (
-    cmd,
-    arg,
-    hide,
-    retrieve,
-    Argument,
-    Command,
-    Group,
-    EntryPoint,
-    Cli2Error,
-    Cli2ValueError,
-)
-from .asyncio import async_resolve, files_read
-from .queue import Queue
-from .colors import colors as c
+# these share their name with their module, so they must be imported before
+# anything does ``import cli2.log`` or ``import cli2.theme``
+from .log import configure, flush, iter_entries, log, parse
 from .theme import theme, t
-from .display import (
-    diff,
-    diff_data,
-    render,
-    print,
-    highlight,
-    yaml_dump,
-    yaml_highlight,
+
+# other attributes are imported on first access, to keep ``import cli2``
+# cheap for short-lived programs
+_lazy = dict(
+    cmd='cli',
+    arg='cli',
+    hide='cli',
+    retrieve='cli',
+    Argument='cli',
+    Command='cli',
+    Group='cli',
+    EntryPoint='cli',
+    Cli2Error='cli',
+    Cli2ValueError='cli',
+    Lazy='cli',
+    async_resolve='asyncio',
+    files_read='asyncio',
+    Queue='queue',
+    c='colors',
+    diff='display',
+    diff_data='display',
+    render='display',
+    print='display',
+    highlight='display',
+    yaml_dump='display',
+    yaml_highlight='display',
+    confirm='interactive',
+    choice='interactive',
+    editor='interactive',
+    Mask='mask',
+    closest='notlevenshtein',
+    closest_path='notlevenshtein',
+    Proc='proc',
+    Find='find',
+    Table='table',
 )
-from .interactive import confirm, choice, editor
+
 try:
     import fcntl
 except ImportError:
     """ windows """
 else:
-    from .lock import Lock
+    _lazy['Lock'] = 'lock'
 
-from .log import configure, log, parse
-from .mask import Mask
-from .notlevenshtein import closest, closest_path
-from .proc import Proc
-from .find import Find
-from .table import Table
 
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module = importlib.import_module(f'.{_lazy[name]}', __name__)
+    value = getattr(module, 'colors' if name == 'c' else name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
+
+
+def _excepthook(etype, value, tb):
+    """ Format tracebacks with cli2.traceback, unless disabled. """
+    if bool(cfg['CLI2_TRACEBACK_DISABLE']):
+        return sys.__excepthook__(etype, value, tb)
+    from .traceback import _formatter
+    return _formatter.excepthook(etype, value, tb)
 
-import os
 
-if not bool(cfg['CLI2_TRACEBACK_DISABLE']):
-    from .traceback import enable
-    enable()
+sys.excepthook = _excepthook
 
 
 def which(cmd):
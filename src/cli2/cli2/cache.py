@@ -0,0 +1,214 @@
+"""
+On-disk cache of the command tree metadata.
+
+Rendering the help of a :py:class:`~cli2.cli.Group` requires to instanciate
+every :py:class:`~cli2.cli.Command`, inspecting signatures and parsing
+docstrings. When a group runs as an entry point, the names, short docs,
+argument aliases and types of the whole command tree are saved in a JSON file
+instead, so that ``help`` and ``complete`` can answer from there.
+
+The cache is invalidated when any source file of the commands changes, or
+when the group has sub-commands that the cache doesn't know about.
+
+Shell completion
+----------------
+
+Any group entry point supports a ``complete`` sub-command, that prints
+candidates for the last of the given words, for example with bash:
+
+.. code-block:: bash
+
+    _yourcli() {
+        COMPREPLY=($(yourcli complete "${COMP_WORDS[@]:1:COMP_CWORD}"))
+    }
+    complete -F _yourcli yourcli
+
+.. envvar:: CLI2_CACHE
+
+    Directory to store the cache files in, or ``none`` to disable the cache.
+
+    Default: ``~/.local/cli2/cache``
+"""
+
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+
+def path(name, script):
+    """
+    Return the cache file path for an entry point, None if disabled.
+
+    :param name: Name of the entry point.
+    :param script: Path to the script running the entry point.
+    """
+    directory = os.getenv('CLI2_CACHE', '')
+    if directory == 'none':
+        return None
+    if not directory:
+        directory = Path(os.getenv('HOME')) / '.local/cli2/cache'
+    key = hashlib.sha1(os.path.abspath(script).encode()).hexdigest()[:8]
+    return Path(directory) / f'{name}-{key}.json'
+
+
+def build(entry, files=None):
+    """
+    Return the metadata of an entry, this instanciates every command.
+
+    :param entry: :py:class:`~cli2.cli.Group` or
+                  :py:class:`~cli2.cli.Command`.
+    :param files: Set to add the source file of each command to.
+    """
+    from .cli import Group
+
+    files = set() if files is None else files
+    module = sys.modules.get(type(entry).__module__, None)
+    data = dict(
+        doc=entry.help(short=True),
+        color=entry.color if isinstance(entry.color, str) else None,
+    )
+    if isinstance(entry, Group):
+        data['description'] = entry.doc or ''
+        data['commands'] = {
+            name: build(child, files)
+            for name, child in entry.items()
+        }
+    else:
+        module = sys.modules.get(getattr(entry.target, '__module__', None))
+        data['args'] = [
+            dict(
+                name=arg.param.name,
+                aliases=list(arg.alias),
+                negates=list(arg.negates),
+                type=getattr(arg.param.annotation, '__name__', None)
+                if arg.param.annotation != arg.param.empty else None,
+            )
+            for arg in entry.values()
+            if not arg.hide
+        ]
+    if getattr(module, '__file__', None):
+        files.add(module.__file__)
+    return data
+
+
+def load(file, group):
+    """
+    Return the cached metadata for a group, None if invalid.
+
+    :param file: Path to the cache file.
+    :param group: Root :py:class:`~cli2.cli.Group`.
+    """
+    try:
+        with open(file, 'r') as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+    if not set(group.keys()) <= set(data.get('commands', [])):
+        return None
+
+    for source, mtime in data.get('files', {}).items():
+        try:
+            if os.stat(source).st_mtime_ns != mtime:
+                return None
+        except OSError:
+            return None
+    return data
+
+
+def dump(file, data, files):
+    """
+    Add source files mtimes to metadata and write it to a cache file.
+
+    The file is written next to the cache file and then renamed, so that
+    concurrent runs never read it half-written. Errors are ignored, ie. with
+    an unwritable :envvar:`CLI2_CACHE` directory or a full disk.
+
+    :param file: Path to the cache file.
+    :param data: Metadata returned by :py:func:`build`.
+    :param files: Source files to check the mtime of when loading.
+    """
+    data['files'] = {
+        source: os.stat(source).st_mtime_ns
+        for source in files
+        if os.path.exists(source)
+    }
+    tmp = file.parent / f'.{file.name}.{os.getpid()}'
+    try:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, 'w') as fh:
+            json.dump(data, fh)
+        os.replace(tmp, file)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def get(entry, *names):
+    """
+    Return the metadata of an entry or of a sub-command of it.
+
+    Metadata of the root group comes from its cache file, which is written
+    if necessary. Without a cache file, this returns None instead of
+    instanciating every command.
+
+    :param entry: :py:class:`~cli2.cli.Group` or
+                  :py:class:`~cli2.cli.Command`.
+    :param names: Sub-command names to walk to.
+    """
+    chain = [*names]
+    root = entry
+    while root.parent is not None:
+        chain.insert(0, root.name)
+        root = root.parent
+
+    file = getattr(root, 'cache_path', None)
+    if not file:
+        return None
+
+    data = load(file, root)
+    if data is None:
+        files = set()
+        data = build(root, files)
+        dump(file, data, files)
+
+    for name in chain:
+        data = data.get('commands', {}).get(name, None)
+        if data is None:
+            return None
+    return data
+
+
+def complete(data, words):
+    """
+    Return completion candidates for the last word.
+
+    :param data: Metadata returned by :py:func:`build`.
+    :param words: Words typed so far, the last one being completed.
+    """
+    *words, partial = words or ['']
+    for word in words:
+        if 'commands' not in data:
+            # we're in a command, the rest are arguments
+            break
+        data = data['commands'].get(word, None)
+        if data is None:
+            return []
+
+    if 'commands' in data:
+        candidates = data['commands']
+    else:
+        candidates = [
+            option
+            for arg in data['args']
+            for option in arg['aliases'] + arg['negates']
+        ]
+    return sorted(
+        candidate
+        for candidate in candidates
+        if candidate.startswith(partial)
+    )
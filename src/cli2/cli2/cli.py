@@ -9,6 +9,7 @@ import textwrap
 
 from docstring_parser import parse
 
+from . import cache
 from . import display
 from .colors import colors
 from .asyncio import async_resolve
@@ -95,6 +96,8 @@ def retrieve(path):
 
 
 class EntryPoint:
+    cache_path = None
+
     def __init__(self, *args, outfile=None, log=True, **kwargs):
         self.outfile = outfile or sys.stdout
         self.exit_code = 0
@@ -103,6 +106,7 @@ class EntryPoint:
     def entry_point(self, *args):
         args = args or sys.argv
         self.name = os.path.basename(args[0])
+        self.cache_path = cache.path(self.name, args[0])
 
         result = self(*args[1:])
         if result is not None:
@@ -165,6 +169,18 @@ class EntryPoint:
         return ' '.join(tokens).rstrip('.') if tokens else ''
 
 
+class Lazy:
+    """
+    Group entry that is materialized on first access.
+
+    .. py:attribute:: factory
+
+        Callable that returns the :py:class:`Command` or :py:class:`Group`.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+
+
 class Group(EntryPoint, dict):
     """Represents a group of named commands."""
 
@@ -194,14 +210,45 @@ class Group(EntryPoint, dict):
         self._overrides = Overrides(value)
 
     def add(self, target, *args, **kwargs):
-        """Add a new target as sub-command."""
+        """
+        Add a new target as sub-command.
+
+        The command is registered as a :py:class:`Lazy` entry: it will only
+        be instanciated, with its signature and docstring parsed, when it's
+        accessed.
+        """
         cmdclass = kwargs.pop('cls', self.cmdclass)
-        cmd = cmdclass(target, *args, **kwargs)
-        self[cmd.name] = cmd
-        cmd.group = self
+        name = args[0] if args else kwargs.get('name', None)
+        if not name:
+            name = getattr(target, 'cli2', {}).get('name', None)
+        if not name:
+            name = getattr(target, '__name__', type(target).__name__)
+
+        def factory():
+            cmd = cmdclass(target, *args, **kwargs)
+            cmd.group = self
+            return cmd
+        self[name] = Lazy(factory)
         return self
 
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, Lazy):
+            value = self[key] = value.factory()
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
     def __setitem__(self, key, value):
+        if isinstance(value, Lazy):
+            return super().__setitem__(key, value)
         if isinstance(value, Group):
             value.name = key
         value.posix = self.posix
@@ -241,6 +288,10 @@ class Group(EntryPoint, dict):
         :param short: Show short documentation.
         """
         if args:
+            data = cache.get(self, *args)
+            if data and 'commands' in data:
+                return self.help_print(data, [*args], error=error)
+
             target = self
             for arg in args:
                 if arg in target:
@@ -257,11 +308,34 @@ class Group(EntryPoint, dict):
                 return self.doc_short
             return ''
 
+        data = cache.get(self)
+        if not data:
+            data = dict(
+                description=self.doc,
+                commands={
+                    name: dict(
+                        color=command.color,
+                        doc=command.help(short=True),
+                    )
+                    for name, command in self.items()
+                },
+            )
+        return self.help_print(data, error=error)
+    help.cli2 = dict(color='green')
+
+    def help_print(self, data, names=None, error=None):
+        """
+        Print help from metadata.
+
+        :param data: Group metadata, see :py:func:`cli2.cache.build`.
+        :param names: Sub-group names to show help for.
+        :param error: Error message to print out.
+        """
         if error:
             self.print('RED', 'ERROR: ' + t.reset + error, end='\n\n')
 
         self.print('ORANGE', 'SYNOPSYS')
-        chain = []
+        chain = [*(names or [])]
         current = self
         while current:
             chain.insert(0, current)
@@ -273,25 +347,34 @@ class Group(EntryPoint, dict):
             self.print(' '.join(map(str, chain)) + ' SUB-COMMAND')
         self.print()
 
-        if self.doc:
+        if data['description']:
             self.print('ORANGE', 'DESCRIPTION')
-            self.print(self.doc.strip())
+            self.print(data['description'].strip())
             self.print()
 
         from .table import Table
         table = Table(*[
             (
                 (
-                    getattr(t, command.color, command.color),
+                    getattr(t, command['color'], command['color']),
                     name,
                 ),
-                command.help(short=True),
+                command['doc'],
             )
-            for name, command in self.items()
+            for name, command in data['commands'].items()
         ])
         self.print('ORANGE', 'SUB-COMMANDS')
         table.print(self.print)
-    help.cli2 = dict(color='green')
+
+    def complete(self, *words):
+        """
+        Print shell completion candidates, see :py:mod:`cli2.cache`.
+
+        :param words: Words typed so far, the last one being completed.
+        """
+        data = cache.get(self) or cache.build(self)
+        for candidate in cache.complete(data, words):
+            self.print(candidate)
 
     def load(self, obj):
         if loader := getattr(obj, 'cli2_load', None):
@@ -364,6 +447,8 @@ class Group(EntryPoint, dict):
             result = self[argv[0]](*argv[1:])
             # fetch exit code
             self.exit_code = self[argv[0]].exit_code
+        elif argv[0] == 'complete':
+            return self.complete(*argv[1:])
         else:
             return self.help(error=f'Command {argv[0]} not found')
 
@@ -389,6 +474,8 @@ class Command(EntryPoint, dict):
 
     def __init__(self, target, name=None, color=None, doc=None, posix=False,
                  help_hack=True, outfile=None, log=True, overrides=None):
+        self._keys = dict()
+        self._aliases = None
         self.posix = posix
         self.parent = None
         self.help_hack = help_hack
@@ -473,7 +560,14 @@ class Command(EntryPoint, dict):
     def sig(self):
         return inspect.signature(self.target)
 
+    def __setitem__(self, key, value):
+        self._keys.clear()
+        self._aliases = None
+        return super().__setitem__(key, value)
+
     def __delitem__(self, key):
+        self._keys.clear()
+        self._aliases = None
         if key in self.positions:
             del self.positions[key]
         return super().__delitem__(key)
@@ -488,6 +582,9 @@ class Command(EntryPoint, dict):
         self.args_setting = True
         self.setargs()
         self.args_set = True
+        # setargs may have changed arguments after adding them
+        self._keys.clear()
+        self._aliases = None
 
     def setargs(self):
         """Reset arguments."""
@@ -575,9 +672,10 @@ class Command(EntryPoint, dict):
         self._setargs()
         self.bound = self.sig.bind_partial()
         extra = []
+        arguments = [*self.values()]
         for current in argv:
             taken = False
-            for arg in self.values():
+            for arg in arguments:
                 taken = arg.take(current)
                 if taken:
                     break
@@ -768,9 +866,15 @@ class Command(EntryPoint, dict):
         """
         Return ordered keys.
 
+        The result is cached after :py:meth:`setargs`, until an argument is
+        added or removed.
+
         :param factories: Show only arguments with factory.
         """
         self._setargs()
+        if factories in self._keys:
+            return self._keys[factories]
+
         order = (
             inspect.Parameter.POSITIONAL_ONLY,
             inspect.Parameter.POSITIONAL_OR_KEYWORD,
@@ -793,8 +897,29 @@ class Command(EntryPoint, dict):
             if factories and not self[key].factory:
                 continue
             keys.insert(position, key)
+
+        if self.args_set:
+            self._keys[factories] = keys
         return keys
 
+    def aliases(self):
+        """
+        Return a dict of alias and negate option to list of arguments.
+
+        Cached until an argument is added or removed, like :py:meth:`keys`.
+        """
+        if self._aliases is not None:
+            return self._aliases
+
+        aliases = dict()
+        for arg in self.values():
+            for alias in [*arg.alias, *arg.negates]:
+                aliases.setdefault(alias, []).append(arg)
+
+        if self.args_set:
+            self._aliases = aliases
+        return aliases
+
     def __iter__(self):
         return self.ordered().__iter__()
 
@@ -850,6 +975,7 @@ class Command(EntryPoint, dict):
         )
         if position is not None:
             self.positions[name] = position
+            self._keys.clear()
 
     def post_call(self):
         """
@@ -899,6 +1025,7 @@ class Argument:
                 self.negate = self.negate.replace('_', '-')
 
         self.taking = False
+        self._negates = None
 
     @property
     def alias(self):
@@ -923,7 +1050,14 @@ class Argument:
 
     @property
     def negates(self):
-        return self.optlist(self.negate, lambda a: '-n' + a.lstrip('-')[3])
+        # cached like aliases, as long as negate and posix don't change
+        key = (self.negate, self.cmd.posix)
+        if self._negates is None or self._negates[0] != key:
+            self._negates = (
+                key,
+                self.optlist(self.negate, lambda a: '-n' + a.lstrip('-')[3]),
+            )
+        return self._negates[1]
 
     def optlist(self, opt, shortgen):
         if not opt:
@@ -1181,17 +1315,20 @@ class Argument:
         # look ahead for keyword arguments that would match this
         # so that you can skip arguments that are both keyword and positional
         # ie. `foo b=x` binds 'x' to 'b' in foo(a=None, b=None)
-        for name, argument in self.cmd.items():
-            if not argument.accepts:
-                continue
-            if argument == self:
-                continue
-            if argument.aliasmatch(arg):
-                return
+        aliases = self.cmd.aliases()
+        options = {arg, arg.split('=')[0]} if isinstance(arg, str) else {arg}
+        for option in options:
+            for argument in aliases.get(option, []):
+                if not argument.accepts:
+                    continue
+                if argument == self:
+                    continue
+                if argument.aliasmatch(arg):
+                    return
 
         # edge case varkwargs
         # priority to varkwargs for word= and **{}
-        last = self.cmd[[*self.cmd.keys()][-1]]
+        last = self.cmd[self.cmd.keys()[-1]]
         if last is not self and last.param.kind == self.param.VAR_KEYWORD:
             if re.match('^-?-?[\\w]+=', arg):
                 return
@@ -3,6 +3,7 @@ Demonstration of a completely dynamic command line !
 """
 import cli2
 import inspect
+from . import cache
 from .node import Node
 
 
@@ -27,9 +28,17 @@ class ConsoleScript(cli2.Group):
         dotted = None
         if len(argv) > 1 and argv[0] == 'help':
             dotted = argv[1]
-        elif argv:
+        elif len(argv) > 2 and argv[0] == 'complete':
+            dotted = argv[1]
+        elif argv and argv[0] != 'complete':
             dotted = argv[0]
 
+        if dotted and argv[0] in ('help', 'complete'):
+            # don't import what the cache can answer for
+            data = cache.get(self, dotted)
+            if data and (argv[0] == 'complete' or 'commands' in data):
+                dotted = None
+
         if dotted:
             # Lazy load argument as command or group
             node = Node.factory(dotted)
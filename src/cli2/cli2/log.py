@@ -47,6 +47,35 @@ variables.
 
     Default: ``auto``
 
+.. envvar:: LOG_FORMAT
+
+    Format of the log file:
+
+    - ``plain``: human readable, with YAML rendering for the ``json`` key,
+    - ``jsonl``: one JSON object per line, faster to write and to read with
+      :py:func:`iter_entries`.
+
+    Default: ``plain``
+
+.. envvar:: LOG_QUEUE
+
+    Maximum number of log records to queue, setting this enables asynchronous
+    logging: log calls only enqueue the event, which is rendered and written
+    by a background thread. Pending records are written on exit, or with
+    :py:func:`flush`. Dicts and lists of the events are copied when they are
+    queued, so that changes made afterwards don't show in the logs.
+
+    Default: empty, which means synchronous logging.
+
+.. envvar:: LOG_QUEUE_OVERFLOW
+
+    What to do when the :envvar:`LOG_QUEUE` is full:
+
+    - ``block``: wait for the background thread to make room,
+    - ``drop``: discard the record.
+
+    Default: ``block``
+
 .. envvar:: DEBUG
 
     Setting this will set :envvar:`LOG_LEVEL` to `DEBUG`, but also activate
@@ -56,49 +85,185 @@ variables.
     avoid leaking way to much information in say Ansible Tower and stuff like
     that.
     But if you're debugging manually, you will surely need that at some point.
+
+Logging is configured lazily: importing this module doesn't touch the file
+system, :py:func:`configure` runs when the first logger is created, unless
+you have called it yourself before.
 """
 
+import atexit
 import datetime
-import logging.config
+import json
+import logging.handlers
 import os
+import queue
 import re
 import sys
 import structlog
-import yaml
 from pathlib import Path
 
-from cli2.traceback import TracebackFormatter
-import cli2.display
-
 
 class YAMLFormatter:
     def __init__(self, colors=True):
         self.colors = colors
 
     def __call__(self, key, value):
-        value = cli2.display.yaml_dump(value)
+        from cli2.display import yaml_dump, yaml_highlight
+        value = yaml_dump(value)
         if self.colors:
-            value = cli2.display.yaml_highlight(value)
+            value = yaml_highlight(value)
         return '\n' + value
 
 
 def cli2_traceback(sio, exc_info):
+    from cli2.traceback import TracebackFormatter
     exc_type, exc_value, exc_traceback = exc_info
     formatter = TracebackFormatter()
     formatter.parse(exc_type, exc_value, exc_traceback)
     sio.write('\n' + '\n'.join(formatter.output))
 
 
-def configure(log_file=None):
+def exc_info_capture(logger, method_name, event_dict):
+    """
+    Capture the exception in the calling thread, because rendering may
+    happen in the :envvar:`LOG_QUEUE` thread.
+    """
+    if event_dict.get('exc_info') is True:
+        event_dict['exc_info'] = sys.exc_info()
+    return event_dict
+
+
+def _copy(data):
+    """
+    Return a copy of nested dicts and lists, other objects are shared.
+    """
+    if isinstance(data, dict):
+        return {key: _copy(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_copy(item) for item in data]
+    return data
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves all formatting to the listener thread.
+
+    .. py:attribute:: overflow
+
+        ``block`` or ``drop``, see :envvar:`LOG_QUEUE_OVERFLOW`.
+
+    .. py:attribute:: dropped
+
+        Number of records dropped because the queue was full.
+    """
+    def __init__(self, queue, overflow='block'):
+        super().__init__(queue)
+        self.overflow = overflow
+        self.dropped = 0
+
+    def prepare(self, record):
+        # the record never leaves the process: keep the structlog event dict,
+        # but copy its containers which callers may change before the
+        # listener thread renders them
+        if isinstance(record.msg, dict):
+            record.msg = _copy(record.msg)
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == 'block':
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+listener = None
+configured = False
+
+
+class LoggerFactory(structlog.stdlib.LoggerFactory):
+    """
+    Logger factory that calls :py:func:`configure` on first use if it wasn't
+    called yet.
+    """
+    def __call__(self, *args):
+        if not configured:
+            configure()
+        return super().__call__(*args)
+
+
+def enabled(level, name='cli2'):
+    """
+    Return True if a record of that level would be emitted by any handler.
+
+    Use it to skip building expensive log data that nothing would write.
+
+    :param level: Log level, ie. ``logging.DEBUG``.
+    :param name: Name of the stdlib logger.
+    """
+    if not configured:
+        configure()
+    logger = logging.getLogger(name)
+    if not logger.isEnabledFor(level):
+        return False
+
+    found = False
+    while logger:
+        for handler in logger.handlers:
+            found = True
+            if isinstance(handler, QueueHandler) and listener:
+                handlers = listener.handlers
+            else:
+                handlers = [handler]
+            for handler in handlers:
+                if level >= handler.level:
+                    return True
+        if not logger.propagate:
+            break
+        logger = logger.parent
+    return not found and level >= logging.lastResort.level
+
+
+def flush():
+    """
+    Wait until the :envvar:`LOG_QUEUE` thread has written pending records.
+    """
+    if listener:
+        listener.stop()
+        listener.start()
+
+
+@atexit.register
+def _listener_stop():
+    global listener
+    if listener:
+        listener.stop()
+        listener = None
+
+
+def configure(log_file=None, log_queue=None, log_format=None):
     """
     Configure logging.
 
     :param log_file: override for :envvar:`LOG_FILE`.
+    :param log_queue: override for :envvar:`LOG_QUEUE`.
+    :param log_format: override for :envvar:`LOG_FORMAT`.
     """
+    import logging.config
     from cli2.configuration import cfg
+    global configured, listener
+    configured = True
+
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING').upper()
     if log_file is None:
         log_file = os.getenv('LOG_FILE', 'auto')
+    if log_queue is None:
+        log_queue = os.getenv('LOG_QUEUE', '')
+    if log_format is None:
+        log_format = os.getenv('LOG_FORMAT', 'plain')
 
     if os.getenv('DEBUG'):
         LOG_LEVEL = 'DEBUG'
@@ -169,6 +334,15 @@ def configure(log_file=None):
                     )
                 ],
             },
+            'jsonl': {
+                'foreign_pre_chain': pre_chain,
+                '()': structlog.stdlib.ProcessorFormatter,
+                'processors': [
+                    structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                    structlog.processors.format_exc_info,
+                    structlog.processors.JSONRenderer(default=str),
+                ],
+            },
             'colored': {
                 'foreign_pre_chain': pre_chain,
                 '()': structlog.stdlib.ProcessorFormatter,
@@ -224,15 +398,31 @@ def configure(log_file=None):
         LOGGING['handlers']['file'] = {
             'level': 'DEBUG',
             'class': 'logging.handlers.WatchedFileHandler',
-            'formatter': 'plain',
+            'formatter': log_format,
             'filename': str(log_file),
         }
 
+    _listener_stop()
     logging.config.dictConfig(LOGGING)
 
+    if log_queue:
+        handler = QueueHandler(
+            queue.Queue(int(log_queue)),
+            os.getenv('LOG_QUEUE_OVERFLOW', 'block'),
+        )
+        listener = logging.handlers.QueueListener(
+            handler.queue,
+            *logging.getLogger('cli2').handlers,
+            respect_handler_level=True,
+        )
+        for name in LOGGING['loggers']:
+            logging.getLogger(name).handlers = [handler]
+        listener.start()
+
     processors = [
         structlog.stdlib.add_log_level,
         structlog.stdlib.PositionalArgumentsFormatter(),
+        exc_info_capture,
     ]
     if 'NO_TIMESTAMPER' not in os.environ:
         processors.append(timestamper)
@@ -242,7 +432,7 @@ def configure(log_file=None):
     ]
 
     structlog.configure(
-        logger_factory=structlog.stdlib.LoggerFactory(),
+        logger_factory=LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
         processors=processors,
@@ -255,9 +445,35 @@ def parse(data):
 
     :param data: Contents of a log file.
     """
+    return list(_entries(data.split('\n')))
+
+
+def iter_entries(path):
+    """
+    Iterate over the entries of a log file, reading it line by line.
+
+    Works with any :envvar:`LOG_FORMAT`, but ``jsonl`` is much faster.
+
+    :param path: Path to the log file.
+    """
+    with open(path, 'r') as fh:
+        yield from _entries(line.rstrip('\n') for line in fh)
+
+
+def _entries(lines):
+    import yaml
     yaml_lines = []
-    entries = []
-    for line in data.split('\n'):
+    for line in lines:
+        if line.startswith('{'):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                pass
+            else:
+                if isinstance(data, dict) and 'event' in data:
+                    yield data
+                    continue
+
         if 'event=' in line:
             data = {}
             for token in line.strip().split():
@@ -270,12 +486,15 @@ def parse(data):
             if yaml_lines:
                 data['json'] = yaml.safe_load('\n'.join(yaml_lines))
 
-            entries.append(data)
+            yield data
             yaml_lines = []
         else:
             yaml_lines.append(line)
-    return entries
 
 
-configure()
+structlog.configure(
+    logger_factory=LoggerFactory(),
+    wrapper_class=structlog.stdlib.BoundLogger,
+    cache_logger_on_first_use=False,
+)
 log = structlog.get_logger('cli2')
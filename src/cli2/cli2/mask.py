@@ -4,13 +4,57 @@ Secret data masking module.
 
 import copy
 import os
+import re
 
 
-class LearnedError(Exception):
+def values_compile(values, prefixes=False):
     """
-    Raised when a new value is learned, to run masking again.
+    Compile a regex matching any of the values in a single pass.
+
+    Values are arranged in a trie so that alternatives sharing a prefix are
+    only tried once, and so that the longest value wins at any position.
+
+    :param values: Iterable of strings to match
+    :param prefixes: Match any proper prefix of the values instead
+    """
+    trie = dict()
+    for value in values:
+        node = trie
+        for char in value[:-1] if prefixes else value:
+            node = node.setdefault(char, dict())
+            if prefixes:
+                node[''] = None
+        if not prefixes:
+            node[''] = None
+    return re.compile(_trie_regex(trie))
+
+
+def _trie_regex(node):
+    """
+    Return the regex for a trie node, compress single-child chains.
     """
-    pass
+    branches = []
+    for char, child in sorted(node.items()):
+        if not char:
+            continue
+        prefix = [re.escape(char)]
+        while len(child) == 1 and '' not in child:
+            char, child = next(iter(child.items()))
+            prefix.append(re.escape(char))
+        branches.append(''.join(prefix) + _trie_regex(child))
+
+    if not branches:
+        return ''
+
+    if len(branches) == 1:
+        result = branches[0]
+    else:
+        result = '(?:' + '|'.join(branches) + ')'
+
+    if '' in node:
+        # greedy: prefer the longest value
+        result = '(?:' + result + ')?'
+    return result
 
 
 class Mask:
@@ -58,6 +102,10 @@ class Mask:
         self.keys = set(keys) if keys else set()
         self.values = set(values) if values else set()
         self.renderer = renderer
+        self._pattern = None
+        self._pattern_length = 0
+        self._pattern_values = set()
+        self._prefix_pattern = None
         if os.getenv('DEBUG'):
             self.debug = True
         else:
@@ -68,53 +116,145 @@ class Mask:
         Do our best to mask sensitive values in the data param recursively,
         returning a masked copy of the passed data.
 
+        This happens in two walks: first, :py:meth:`learn` adds the values of
+        any :py:attr:`keys` to :py:attr:`values`, then :py:meth:`_mask`
+        builds the masked copy:
+
         - when data is a dict: it is recursively iterated on, any value that in
           is :py:attr:`keys` will have it's value replaced with
-          ``***MASKED***``, also, the value is added to
-          :py:attr:`values`.
+          ``***MASKED***``.
         - when data is a string, each :py:attr:`values` will be replaced
           with ``***MASKED***``, so we're actually able to mask sensitive
           information from stdout outputs and the likes.
         - when data is a list, each item is passed to :py:meth:`_mask()`.
 
+        Only containers with masked contents are copied, unchanged
+        containers are returned as-is, so, don't mutate the result unless
+        you want to mutate the input too.
+
         Note that the :envvar:`DEBUG` environment variable will prevent any
         masking at all.
 
-        :param data: Any kind of data to mask, will return a deepcopy of that.
+        :param data: Any kind of data to mask.
         """
         if self.debug:
             return data
 
-        while True:
-            try:
-                return self._mask(copy.deepcopy(data))
-            except LearnedError:
-                continue
-            else:
-                break
+        self.learn(data)
+        self._compile()
+        return self._mask(data)
 
-    def _mask(self, data):
+    def learn(self, data):
         """
-        Actual, in-place masking method.
+        Recursively add the values of :py:attr:`keys` to :py:attr:`values`.
+
+        :param data: Any kind of data to learn values from.
         """
         if isinstance(data, dict):
             for key, value in data.items():
                 if key in self.keys:
                     if self.renderer:
                         value = self.renderer(value)
-                    if value not in self.values:
-                        self.values.add(value)
-                        raise LearnedError()
-                    data[key] = '***MASKED***'
+                    self.values.add(value)
                 else:
-                    data[key] = self._mask(value)
+                    self.learn(value)
+        elif isinstance(data, (list, set)):
+            for item in data:
+                self.learn(item)
+
+    def _compile(self):
+        """
+        Compile :py:attr:`values` into a regex, unless they haven't changed.
+        """
+        if self._pattern_values == self.values:
+            return
+        self._pattern_values = set(self.values)
+        values = {str(value) for value in self.values} - {''}
+        self._pattern = values_compile(values) if values else None
+        self._pattern_length = max(map(len, values), default=0)
+        self._prefix_pattern = None
+
+    def _spans(self, text):
+        """
+        Yield the start and end of the values in a text, spans of values
+        that overlap are merged so that no part of a value is left out.
+
+        :param text: String to search
+        """
+        pattern = self._pattern
+        match = pattern.search(text)
+        while match:
+            start, end = match.span()
+            position = start + 1
+            while position < end:
+                overlap = pattern.match(text, position)
+                if overlap:
+                    end = max(end, overlap.end())
+                position += 1
+            yield start, end
+            match = pattern.search(text, end)
+
+    def _sub(self, text, spans):
+        """
+        Return text with spans replaced by ``***MASKED***``.
+        """
+        output = []
+        position = 0
+        for start, end in spans:
+            output.append(text[position:start])
+            output.append('***MASKED***')
+            position = end
+        output.append(text[position:])
+        return ''.join(output)
+
+    def stream(self):
+        """
+        Return a :py:class:`MaskStream` to mask text incrementally.
+
+        .. code-block:: python
+
+            stream = mask.stream()
+            for chunk in chunks:
+                print(stream.write(chunk), end='')
+            print(stream.flush(), end='')
+        """
+        return MaskStream(self)
+
+    def _mask(self, data):
+        """
+        Actual masking method, copies containers only if they change.
+        """
+        if isinstance(data, dict):
+            result = None
+            for key, value in data.items():
+                if key in self.keys:
+                    masked = '***MASKED***'
+                else:
+                    masked = self._mask(value)
+                if masked is value:
+                    continue
+                if result is None:
+                    result = copy.copy(data)
+                result[key] = masked
+            if result is not None:
+                return result
         elif isinstance(data, list):
-            return [self._mask(item) for item in data]
+            result = None
+            for number, item in enumerate(data):
+                masked = self._mask(item)
+                if result is None and masked is not item:
+                    result = data[:number]
+                if result is not None:
+                    result.append(masked)
+            if result is not None:
+                return result
         elif isinstance(data, set):
-            return {self._mask(item) for item in data}
+            result = {self._mask(item) for item in data}
+            if result != data:
+                return result
         elif isinstance(data, str):
-            for value in sorted(self.values, key=len, reverse=True):
-                data = data.replace(str(value), '***MASKED***')
+            if self._pattern:
+                data = self._sub(data, self._spans(data))
         return data
 
     def __repr__(self):
@@ -125,3 +265,87 @@ class Mask:
 
     def __bool__(self):
         return bool(self.keys or self.values)
+
+
+class MaskStream:
+    """
+    Incremental masking filter for text streams, see :py:meth:`Mask.stream`.
+
+    Secrets may straddle chunks: text that could still be the beginning of a
+    secret is held back, which is never more than the length of the longest
+    value minus one character, unless it's a secret that overlaps with the
+    beginning of another one.
+
+    .. py:attribute:: mask
+
+        :py:class:`Mask` object
+
+    .. py:attribute:: buffer
+
+        Text which was written but not yet returned.
+    """
+
+    def __init__(self, mask):
+        self.mask = mask
+        self.buffer = ''
+
+    def write(self, chunk):
+        """
+        Add a chunk of text and return the masked text that is final.
+
+        :param chunk: String to mask
+        """
+        self.buffer += chunk
+        if self.mask.debug:
+            return self.flush()
+
+        self.mask._compile()
+        pattern = self.mask._pattern
+        if not pattern:
+            return self.flush()
+
+        # any value starting before cut would fit in the buffer
+        cut = len(self.buffer) - self.mask._pattern_length + 1
+        spans = []
+        for start, end in self.mask._spans(self.buffer):
+            if start >= cut:
+                break
+            if end > cut and self.pending(max(start + 1, cut), end):
+                # an overlapping value may continue in the next chunk
+                cut = start
+                break
+            spans.append((start, end))
+
+        cut = max(spans[-1][1] if spans else 0, cut)
+        output = self.mask._sub(self.buffer[:cut], spans)
+        self.buffer = self.buffer[cut:]
+        return output
+
+    def pending(self, start, end):
+        """
+        Return True if a value could start in the buffer between two
+        positions and continue after the buffer.
+
+        :param start: First position in the buffer
+        :param end: Position after the last one
+        """
+        mask = self.mask
+        if not mask._prefix_pattern:
+            values = {str(value) for value in mask._pattern_values} - {''}
+            mask._prefix_pattern = values_compile(values, prefixes=True)
+        return any(
+            mask._prefix_pattern.fullmatch(self.buffer, position)
+            for position in range(start, end)
+        )
+
+    def flush(self):
+        """
+        Return the masked remaining text.
+        """
+        buffer, self.buffer = self.buffer, ''
+        if self.mask.debug:
+            return buffer
+        self.mask._compile()
+        if self.mask._pattern:
+            buffer = self.mask._sub(buffer, self.mask._spans(buffer))
+        return buffer
@@ -76,15 +76,21 @@ class Proc:
     .. py:attribute:: stderr_ansi
 
         Stderr output with ANSI escape codes preserved.
+
+    .. py:attribute:: mask
+
+        Optional :py:class:`~cli2.mask.Mask` applied to the command and the
+        live output, captured output is not masked.
     """
     def __init__(self, cmd, *args, quiet=False, inherit=True, timeout=None,
-                 cwd=None, **env):
+                 cwd=None, mask=None, **env):
         """
         :param cmd: Command string (will shlex split) or initial argument
         :param args: Additional command arguments
         :param quiet: Suppress live output printing (default: False)
         :param inherit: Inherit parent environment variables (default: True)
         :param timeout: Maximum execution time in seconds (default: None)
+        :param mask: :py:class:`~cli2.mask.Mask` for live output
         :param env: Additional environment variables to set
         :type env: Environment variables.
         """
@@ -95,6 +101,7 @@ class Proc:
 
         self.cwd = cwd or os.getcwd()
         self.quiet = quiet
+        self.mask = mask
 
         self.env = dict()
         if inherit:
@@ -119,7 +126,7 @@ class Proc:
         """
         return type(self)(
             *self.args, quiet=self.quiet, inherit=True, timeout=self.timeout,
-            **self.env
+            mask=self.mask, **self.env
         )
 
     @property
@@ -148,7 +155,8 @@ class Proc:
             raise RuntimeError("Process already started")
 
         if not self.quiet:
-            log.debug('cmd', cmd=self.cmd)
+            cmd = self.mask(self.cmd) if self.mask else self.cmd
+            log.debug('cmd', cmd=cmd)
 
         self.proc = await asyncio.create_subprocess_exec(
             *[str(arg) for arg in self.args],
@@ -215,8 +223,12 @@ class Proc:
                 self.err_raw.extend(line)
             self.raw.extend(line)
 
-            if not self.quiet:
-                print(decoded_line)
+            if self.quiet:
+                continue
+            if self.mask is not None:
+                # mask complete lines, not to hold back progress output
+                decoded_line = self.mask(decoded_line)
+            print(decoded_line)
 
     @property
     def stdout_ansi(self):
@@ -0,0 +1,104 @@
+import cli2
+import json
+import os
+
+from cli2 import cache
+
+
+def group_factory(path, count=2):
+    group = cli2.Group(name='test', posix=True)
+    group.cache_path = path
+
+    def foo(some_arg: int = None, *, flag: bool = True):
+        """ Foo doc. """
+
+    sub = group.group('sub', doc='Sub doc.')
+    for number in range(count):
+        sub.cmd(foo, name=f'foo{number}')
+    group.cmd(foo)
+    return group
+
+
+def test_cache_get(tmp_path):
+    path = tmp_path / 'test.json'
+    group = group_factory(path)
+    data = cache.get(group)
+    assert data['commands']['foo']['doc'] == 'Foo doc'
+    assert data['commands']['foo']['args'] == [
+        dict(
+            name='some_arg',
+            aliases=['-s', '--some-arg'],
+            negates=[],
+            type='int',
+        ),
+        dict(
+            name='flag',
+            aliases=['-f', '--flag'],
+            negates=['-nf', '--no-flag'],
+            type='bool',
+        ),
+    ]
+    assert __file__ in data['files']
+
+    # a new group answers from the cache without instanciating commands
+    group = group_factory(path)
+    assert cache.get(group['sub'], 'foo1')['doc'] == 'Foo doc'
+    assert isinstance(dict.__getitem__(group['sub'], 'foo1'), cli2.Lazy)
+
+    # new sub-commands invalidate the cache
+    group.cmd(lambda: None, name='new')
+    assert 'new' in cache.get(group)['commands']
+
+    # so do modified source files
+    data = cache.load(path, group)
+    data['files'][__file__] -= 1
+    path.write_text(json.dumps(data))
+    assert cache.load(path, group) is None
+
+
+def test_cache_disabled(tmp_path, monkeypatch):
+    monkeypatch.setenv('CLI2_CACHE', 'none')
+    assert cache.path('test', 'test') is None
+    assert cache.get(cli2.Group()) is None
+
+
+def test_cache_unwritable(tmp_path, capsys):
+    # the cache directory can't be created
+    (tmp_path / 'file').write_text('')
+    group = group_factory(tmp_path / 'file' / 'test.json')
+    assert cache.get(group, 'sub', 'foo1')['doc'] == 'Foo doc'
+    group('help', 'sub')
+    assert 'foo1' in capsys.readouterr().out
+
+    # nor the file written
+    path = tmp_path / 'test.json'
+    path.mkdir()
+    assert cache.get(group_factory(path), 'foo')['doc'] == 'Foo doc'
+    assert sorted(os.listdir(tmp_path)) == ['file', 'test.json']
+
+
+def test_cache_complete(tmp_path):
+    group = group_factory(tmp_path / 'test.json', count=3000)
+    data = cache.get(group)
+    assert cache.complete(data, []) == ['foo', 'help', 'sub']
+    assert cache.complete(data, ['s']) == ['sub']
+    assert cache.complete(data, ['sub', 'foo299']) == [
+        'foo299', *[f'foo299{i}' for i in range(10)],
+    ]
+    assert cache.complete(data, ['foo', '--']) == [
+        '--flag', '--no-flag', '--some-arg',
+    ]
+    assert cache.complete(data, ['nope', '']) == []
+
+    # completion from the cache file doesn't instanciate commands
+    group = group_factory(tmp_path / 'test.json')
+    group.complete('sub', 'foo299')
+    assert isinstance(dict.__getitem__(group['sub'], 'foo1'), cli2.Lazy)
+
+
+def test_cache_help(tmp_path, capsys):
+    cache.get(group_factory(tmp_path / 'test.json'))
+    group = group_factory(tmp_path / 'test.json')
+    group('help', 'sub')
+    assert 'foo1' in capsys.readouterr().out
+    assert isinstance(dict.__getitem__(group['sub'], 'foo1'), cli2.Lazy)
@@ -1,8 +1,14 @@
+import asyncio
 from datetime import datetime
 import cli2
 import chttpx
 import httpx
 import inspect
+import json
+import logging
+import re
+import time
+import weakref
 from unittest import mock
 import pytest
 
@@ -284,6 +290,203 @@ async def test_client_error_retry(httpx_mock, client_class):
     assert len(client.handler.calls) == 2
 
 
+@pytest.mark.asyncio
+async def test_client_reset_coalesce():
+    class Transport(httpx.AsyncBaseTransport):
+        fails = 3
+
+        async def handle_async_request(self, request):
+            await asyncio.sleep(.01)
+            if self.fails:
+                self.fails -= 1
+                raise httpx.ReadError('oops', request=request)
+            return httpx.Response(200)
+
+    client = chttpx.Client(
+        base_url='http://lol',
+        handler=chttpx.Handler(tries=3, backoff=0),
+    )
+    client._client_kwargs['transport'] = Transport()
+    old = client.client
+    created = []
+    factory = client.client_factory
+    client.client_factory = lambda: created.append(factory()) or created[-1]
+    responses = await asyncio.gather(*[client.get('/') for i in range(3)])
+    assert [r.status_code for r in responses] == [200] * 3
+    # the three failures only replaced the client once
+    assert created == [client.client]
+    assert not client._client_requests
+    # shared transport: the old client is left open
+    assert not old.is_closed
+
+    del client._client_kwargs['transport']
+    old = client.client
+    await client.client_reset(old)
+    await client.client_reset(old)
+    await asyncio.gather(*client._client_tasks)
+    assert old.is_closed
+    assert not client.client.is_closed
+
+
+def test_rate_limiter_adapt():
+    limiter = chttpx.RateLimiter(concurrency=8, min_concurrency=2)
+    host = limiter.host('lol')
+    host.adapt(httpx.Response(429))
+    assert host.concurrency == 4
+    host.adapt(httpx.Response(503))
+    host.adapt(httpx.Response(503))
+    assert host.concurrency == 2
+    host.adapt(httpx.Response(200))
+    assert host.concurrency == 2.5
+    host.adapt(httpx.Response(404))
+    assert host.concurrency == 2.5
+
+    host.adapt(httpx.Response(429, headers={'Retry-After': '2'}))
+    assert 1 < host.blocked_until - time.monotonic() <= 2
+    reset = str(int(time.time()) + 5)
+    host.adapt(httpx.Response(200, headers={
+        'X-RateLimit-Remaining': '0',
+        'X-RateLimit-Reset': reset,
+    }))
+    assert 3 < host.blocked_until - time.monotonic() <= 5
+    assert host.delay('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert host.delay('lol') is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter():
+    class Transport(httpx.AsyncBaseTransport):
+        requests = 0
+        requests_max = 0
+
+        async def handle_async_request(self, request):
+            self.requests += 1
+            self.requests_max = max(self.requests, self.requests_max)
+            await asyncio.sleep(.01)
+            self.requests -= 1
+            if request.url.path == '/slow':
+                return httpx.Response(429, headers={'Retry-After': '.05'})
+            return httpx.Response(200)
+
+    transport = Transport()
+    limiter = chttpx.RateLimiter(concurrency=2)
+    handler = chttpx.Handler(tries=0, backoff=0)
+    client = chttpx.Client(
+        base_url='http://lol',
+        limiter=limiter,
+        handler=handler,
+    )
+    client._client_kwargs['transport'] = transport
+    await asyncio.gather(*[client.get('/') for i in range(6)])
+    assert transport.requests_max == 2
+    concurrency = limiter.hosts['lol'].concurrency
+    assert concurrency > 2
+    assert not limiter.hosts['lol'].requests
+
+    with pytest.raises(chttpx.ResponseError):
+        await client.get('/slow')
+    assert limiter.hosts['lol'].concurrency == concurrency / 2
+    start = time.monotonic()
+    await client.get('/')
+    assert time.monotonic() - start >= .04
+
+    # token bucket
+    limiter = chttpx.RateLimiter(rate=100, burst=1)
+    client = chttpx.Client(base_url='http://lol', limiter=limiter)
+    client._client_kwargs['transport'] = transport
+    start = time.monotonic()
+    await asyncio.gather(*[client.get('/') for i in range(4)])
+    assert time.monotonic() - start >= .03
+
+
+def test_backoff():
+    assert chttpx.LinearBackoff(.1)(3) == pytest.approx(.3)
+
+    backoff = chttpx.ExponentialBackoff(base=.1, cap=1)
+    sleeps = [backoff(5) for i in range(100)]
+    assert all(0 <= sleep <= 1 for sleep in sleeps)
+    # jittered: concurrent retries don't happen at once
+    assert len(set(sleeps)) > 1
+
+    backoff = chttpx.DecorrelatedBackoff(base=.1, cap=1)
+    assert .1 <= backoff(0) <= .3
+    assert .1 <= backoff(1, .5) <= 1
+
+
+@pytest.mark.asyncio
+async def test_handler_backoff(client_class):
+    client = client_class()
+    handler = chttpx.Handler(
+        tries=3,
+        backoff=chttpx.DecorrelatedBackoff(base=0, cap=0),
+    )
+    response = httpx.Response(status_code=500)
+    response.request = httpx.Request('GET', '/')
+    assert not await handler(client, response, 0, mock.Mock())
+    assert response.request.extensions['retry_sleep'] == 0
+
+    client.retry_budget = chttpx.RetryBudget(ratio=.5, minimum=1)
+    client.retry_budget.deposit()
+    client.retry_budget.deposit()
+    assert not await handler(client, response, 1, mock.Mock())
+    assert not await handler(client, response, 1, mock.Mock())
+    with pytest.raises(chttpx.RetriesExceededError):
+        await handler(client, response, 1, mock.Mock())
+
+    with pytest.raises(chttpx.CircuitOpenError):
+        await handler(client, chttpx.CircuitOpenError('lol', 1), 0, None)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker():
+    class Transport(httpx.AsyncBaseTransport):
+        requests = 0
+        status_code = 503
+        delay = 0
+
+        async def handle_async_request(self, request):
+            self.requests += 1
+            await asyncio.sleep(self.delay)
+            return httpx.Response(self.status_code)
+
+    transport = Transport()
+    breaker = chttpx.CircuitBreaker(minimum=4, reset=.05)
+    client = chttpx.Client(
+        base_url='http://lol',
+        breaker=breaker,
+        handler=chttpx.Handler(tries=10, backoff=0),
+    )
+    client._client_kwargs['transport'] = transport
+    with pytest.raises(chttpx.CircuitOpenError):
+        await client.get('/')
+    # failed fast after opening
+    assert transport.requests == 4
+
+    # half-open: a failed trial opens again
+    await asyncio.sleep(.05)
+    with pytest.raises(chttpx.CircuitOpenError):
+        await client.get('/')
+    assert transport.requests == 5
+
+    # a cancelled trial lets another request through
+    await asyncio.sleep(.05)
+    transport.delay = 1
+    task = asyncio.create_task(client.get('/'))
+    await asyncio.sleep(.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not breaker.hosts['lol']['trial']
+
+    # a successful trial closes
+    transport.delay = 0
+    transport.status_code = 200
+    await client.get('/')
+    assert breaker.hosts['lol']['opened'] is None
+    await client.get('/')
+    assert transport.requests == 8
+
+
 @pytest.mark.asyncio
 async def test_handler(client_class):
     log = mock.Mock()
@@ -427,6 +630,43 @@ async def test_token(httpx_mock, client_class):
     assert client.token
 
 
+@pytest.mark.asyncio
+async def test_token_single_flight(httpx_mock, client_class):
+    class Client(client_class):
+        tokens = 0
+
+        async def token_get(self):
+            await self.get('http://lol/token')
+            await asyncio.sleep(.01)
+            self.tokens += 1
+            self.token_expires = time.time() + 30
+            return self.tokens
+
+    httpx_mock.add_response(url='http://lol/token', is_reusable=True)
+    httpx_mock.add_response(url='http://lol/', is_reusable=True)
+    client = Client()
+    await asyncio.gather(*[client.get('http://lol/') for i in range(5)])
+    assert client.tokens == 1
+    response = await client.get('http://lol/')
+    assert response.extensions['token'] == 1
+
+    # a refused stale token doesn't reset the new one
+    await client.token_reset(0)
+    assert client.token == 1
+
+    # within expiry margin: refresh in the background
+    assert client.token_expired(client.token_expiry_margin)
+    response = await client.get('http://lol/')
+    assert response.extensions['token'] == 1
+    await client._token_task
+    assert client.token == 2
+
+    # expired: wait for the refresh
+    client.token_expires = time.time()
+    response = await client.get('http://lol/')
+    assert response.extensions['token'] == 3
+
+
 @pytest.mark.asyncio
 async def test_pagination(httpx_mock, client_class):
     httpx_mock.add_response(url='http://lol/', json=[dict(a=1)])
@@ -512,6 +752,243 @@ async def test_pagination_model(httpx_mock, client_class):
     assert isinstance(result[0], Model)
 
 
+@pytest.mark.asyncio
+async def test_paginator_view(httpx_mock, client_class):
+    class Model(client_class.Model):
+        url_list = '/'
+        a = chttpx.Field()
+        b = chttpx.Field('x/b')
+        other = chttpx.Related('Model')
+
+    class Kind(client_class.Model):
+        url_list = '/'
+        a = chttpx.Field()
+        kind = chttpx.Field(callback=lambda obj: 'x')
+
+    httpx_mock.add_response(url='http://lol/', json=[
+        dict(a=i, x=dict(b=i % 10), other=dict(a=i)) for i in range(100)
+    ], is_reusable=True)
+    httpx_mock.add_response(url='http://lol/?page=2', json=[],
+                            is_reusable=True)
+    client = client_class(base_url='http://lol')
+    model = client.Model
+    created = []
+
+    class Lazy(model):
+        def __init__(self, *args, **kwargs):
+            created.append(args)
+            super().__init__(*args, **kwargs)
+
+    paginator = client.paginate('/', (model.b == 3) & (model.a > 50),
+                                model=Lazy).view()
+    assert [obj.a for obj in await paginator.list()] == [53, 63, 73, 83, 93]
+    # only the yielded items were instanciated
+    assert len(created) == 5
+
+    page = paginator.data_items([dict(a=1), dict(a=2)])
+    assert isinstance(page, chttpx.Page)
+    assert page[-1] is page[1]
+    assert page[::-1][0].a == 2
+
+    # impure fields need the model object
+    created.clear()
+    paginator = client.paginate('/', Lazy.other == 'x', model=Lazy).view()
+    assert not await paginator.list()
+    assert len(created) == 100
+
+    # filter functions get models
+    paginator = client.paginate('/', lambda obj: obj.a == 1, model=Lazy)
+    assert [obj.a for obj in await paginator.view().list()] == [1]
+
+    # callback defaults aren't in the raw data
+    paginator = client.Kind.find((Kind.kind == 'x') & (Kind.a < 3))
+    assert [obj.a for obj in await paginator.list()] == [1, 2]
+    assert [obj.a for obj in await paginator.view().list()] == [1, 2]
+
+    # expressions see what callbacks change
+    async def callback(obj):
+        obj.data = dict(obj.data, a=obj.a * 2)
+
+    paginator = client.paginate('/', model.a == 4, model=model)
+    paginator.callback = callback
+    assert [obj.a for obj in await paginator.list()] == [4]
+    assert [obj.a for obj in await paginator.view().list()] == [4]
+
+
+def test_expression_matcher(client_class):
+    class Model(client_class.Model):
+        a = chttpx.Field()
+        b = chttpx.Field('x/b')
+        c = chttpx.DateTimeField()
+        v = chttpx.VirtualField()
+        d = chttpx.Field(callback=lambda obj: obj.a)
+
+    expressions = [
+        Model.d == 3,
+        Model.a == 3,
+        Model.a > 2,
+        Model.a < 3,
+        Model.b.startswith('1'),
+        Model.c > datetime(2024, 1, 5),
+        (Model.a > 1) & ((Model.b == 1) | (Model.a < 5)),
+        (Model.a < 8) & chttpx.Filter(lambda obj: obj.a % 2),
+        Model.v == 2,
+        chttpx.And(),
+        chttpx.Or(),
+    ]
+    datas = [
+        dict(a=i, x=dict(b=i % 3), c=f'2024-01-{i + 1:02d}T00:00:00', v=i)
+        for i in range(10)
+    ] + [
+        dict(a=None, x=dict(b=None), c='2024-02-01T00:00:00'),
+        dict(a=True, x=dict(b=1), c='2024-02-01T00:00:00'),
+        dict(a=2.5, x=dict(b=True), c='2024-02-01T00:00:00'),
+    ]
+    client = client_class()
+    for expression in expressions:
+        objs = [client.Model(dict(data)) for data in datas]
+        expected = [i for i, obj in enumerate(objs) if expression.matches(obj)]
+        matches = expression.matcher()
+        assert [i for i, obj in enumerate(objs) if matches(obj)] == expected
+
+        page = chttpx.Page(client.Model, datas)
+        matches = expression.matcher_data()
+        assert expected == [
+            i for i, data in enumerate(datas) if matches(data, page.item(i))
+        ]
+        assert expression.matcher_page()(datas, page.__getitem__) == expected
+
+    # without model objects
+    expression = (Model.a > 1) & ((Model.a == 2) | (Model.a < 5))
+    datas = [dict(a=i) for i in range(10)]
+    assert expression.matcher_page()(datas, None) == [2, 3, 4]
+    assert expression.matcher_page()([], None) == []
+
+
+def test_expression_benchmark(client_class):
+    class Model(client_class.Model):
+        status = chttpx.Field()
+        size = chttpx.Field()
+
+    expression = chttpx.And(
+        (Model.status == 'failed') | (Model.status == 'error'),
+        Model.size > 100,
+    )
+    datas = [
+        dict(status=('ok', 'failed', 'error')[i % 3], size=i % 1000)
+        for i in range(3000)
+    ]
+    page = chttpx.Page(client_class().Model, datas)
+
+    expected = [
+        index
+        for index, data in enumerate(datas)
+        if expression.matches_data(data, page.item(index))
+    ]
+    assert expression.matcher_page()(datas, page.__getitem__) == expected
+
+
+@pytest.mark.asyncio
+async def test_model_store(httpx_mock, client_class, tmp_path):
+    class Model(client_class.Model):
+        url_list = '/foo'
+        modified_since = 'since'
+        store = chttpx.SQLiteCollectionStore(
+            tmp_path / 'db',
+            ttl=60,
+            indexes=['status', 'size'],
+        )
+        id = chttpx.Field()
+        status = chttpx.Field()
+        size = chttpx.Field()
+
+    httpx_mock.add_response(url='http://lol/foo', json=[
+        dict(id=i, status=('ok', 'failed')[i % 2], size=i) for i in range(10)
+    ])
+    httpx_mock.add_response(url='http://lol/foo?page=2', json=[])
+    client = client_class(base_url='http://lol')
+
+    async def ids(*expressions):
+        return [obj.id for obj in await client.Model.find(*expressions).list()]
+
+    assert await ids(Model.status == 'failed', Model.size > 4) == [5, 7, 9]
+    # answered from the snapshot
+    assert await ids(Model.size < 3) == [1, 2]
+    assert await ids(
+        (Model.size == 2) | (Model.size == 3),
+        lambda obj: obj.status == 'ok',
+    ) == [2]
+    assert await client.Model.find().reverse().list() != []
+
+    key = Model.store.key(client.Model.find())
+    assert key.startswith('http://lol/foo ')
+    collection = Model.store.get(key)
+    assert collection.candidates(
+        (Model.status == 'failed') & (Model.size > 4) & (Model.size < 9)
+    ) == {5, 7}
+
+    # objects don't change the snapshot
+    obj = await client.Model.find(Model.size == 1).first()
+    obj.status = 'changed'
+    assert await ids(Model.status == 'changed') == []
+
+    # incremental sync once expired
+    collection.synced -= 100
+    httpx_mock.add_response(url=re.compile('.*since=[^&]*$'), json=[
+        dict(id=1, status='ok', size=1),
+        dict(id=10, status='failed', size=10),
+    ])
+    httpx_mock.add_response(url=re.compile('.*since=.*page=2'), json=[])
+    assert await ids(Model.status == 'failed') == [3, 5, 7, 9, 10]
+
+    # snapshots are loaded from the database by other stores
+    store = chttpx.SQLiteCollectionStore(tmp_path / 'db', indexes=['size'])
+    paginator = client.Model.find(Model.size > 8).local(store)
+    assert [obj.id for obj in await paginator.list()] == [9, 10]
+    assert store.get(key).synced == collection.synced
+
+    # refresh fetches everything again
+    Model.store.refresh()
+    assert store.get(key) is store.collections[key]
+    assert chttpx.SQLiteCollectionStore(tmp_path / 'db').get(key) is None
+    httpx_mock.add_response(url='http://lol/foo', json=[dict(id=1, size=1)])
+    httpx_mock.add_response(url='http://lol/foo?page=2', json=[])
+    assert await ids() == [1]
+
+
+@pytest.mark.asyncio
+async def test_model_store_clients(httpx_mock, client_class):
+    class Model(client_class.Model):
+        url_list = '/foo'
+        store = chttpx.CollectionStore()
+        id = chttpx.Field()
+
+    for url, token, ids in (
+        ('http://a/foo', 'x', [1]),
+        ('http://a/foo', 'y', [2]),
+        ('http://b/foo', 'x', [3]),
+    ):
+        headers = dict(authorization=token)
+        httpx_mock.add_response(url=url, match_headers=headers,
+                                json=[dict(id=id) for id in ids])
+        httpx_mock.add_response(url=f'{url}?page=2', match_headers=headers,
+                                json=[])
+
+    async def ids(base_url, token):
+        client = client_class(
+            base_url=base_url,
+            headers=dict(authorization=token),
+        )
+        return [obj.id for obj in await client.Model.find().list()]
+
+    # snapshots aren't shared between hosts or credentials
+    assert await ids('http://a', 'x') == [1]
+    assert await ids('http://a', 'y') == [2]
+    assert await ids('http://b', 'x') == [3]
+    assert await ids('http://a', 'x') == [1]
+    assert len(Model.store.collections) == 3
+
+
 def test_paginator_fields(client_class):
     paginator = chttpx.Paginator(client_class(), '/')
     paginator.total_items = 95
@@ -637,6 +1114,54 @@ async def test_pagination_last(httpx_mock, reverse_client):
     assert last_item['a'] == 5
 
 
+@pytest.mark.asyncio
+async def test_pagination_prefetch(httpx_mock, reverse_client):
+    for page in range(1, 6):
+        suffix = f'?page={page}' if page > 1 else ''
+        httpx_mock.add_response(
+            url=f'http://lol/bar{suffix}',
+            json=dict(total_pages=5, items=[dict(a=page * 2), dict(a=page)]),
+        )
+
+    paginator = reverse_client.paginate('/bar').prefetch(3)
+    assert paginator.concurrency == 3
+    results = await paginator.list()
+    assert [x['a'] for x in results] == [2, 1, 4, 2, 6, 3, 8, 4, 10, 5]
+    assert len(httpx_mock.get_requests()) == 5
+
+
+@pytest.mark.asyncio
+async def test_pagination_prefetch_close(httpx_mock, client_class):
+    class Paginator(client_class.Paginator):
+        def pagination_initialize(self, data):
+            self.total_pages = data['total_pages']
+
+    async def respond(request):
+        if 'page=2' in str(request.url):
+            raise httpx.ConnectError('down')
+        if 'page=3' in str(request.url):
+            # hold the semaphore until cancelled
+            await asyncio.Event().wait()
+        return httpx.Response(200, json=dict(
+            total_pages=3,
+            items=[dict(a=1), dict(a=2)],
+        ))
+
+    httpx_mock.add_callback(respond, is_reusable=True)
+    client = client_class(
+        base_url='http://lol',
+        concurrency=1,
+        handler=chttpx.Handler(tries=0, backoff=0),
+    )
+    iterator = aiter(Paginator(client, '/bar').prefetch(3))
+    assert (await anext(iterator))['a'] == 1
+    await asyncio.sleep(.01)
+    assert client.semaphore.locked()
+    await iterator.aclose()
+    # prefetched requests were cancelled and awaited
+    assert not client.semaphore.locked()
+
+
 @pytest.mark.asyncio
 async def test_paginator_call(httpx_mock):
     httpx_mock.add_response(
@@ -847,6 +1372,62 @@ async def test_expression_parameter(httpx_mock, client_class):
     assert [x.a for x in ones] == [1, 3]
 
 
+@pytest.mark.asyncio
+async def test_expression_plan(httpx_mock, client_class):
+    class Client(client_class):
+        operators = {
+            'lt': '{parameter}__lt',
+            'in': lambda parameter, value: {
+                f'{parameter}__in': ','.join(value),
+            },
+        }
+
+    class Model(Client.Model):
+        url_list = '/foo'
+        a = chttpx.Field()
+        b = chttpx.Field(parameter='b', parameters=dict(gt='b_min'))
+        c = chttpx.Field(parameter='c')
+
+    client = Client(base_url='http://lol')
+    paginator = client.Model.find(
+        (Model.b > 1) & (Model.a == 1),
+        (Model.b < 5) & (Model.c.startswith('x')),
+        (Model.c == 'x') | (Model.c == 'y'),
+        (Model.a == 1) | (Model.c == 'y'),
+        lambda obj: True,
+    )
+    plan = paginator.plan()
+    assert plan.params == dict(b_min=1, b__lt=5, c__in='x,y')
+    assert [repr(exp) for exp in plan.pushed] == [
+        'b > 1', 'b < 5', "(c == 'x' or c == 'y')",
+    ]
+    assert [repr(exp) for exp in plan.residuals] == [
+        'a == 1', "c startswith 'x'", "(a == 1 or c == 'y')", '<lambda>',
+    ]
+    assert paginator.explain() == '\n'.join([
+        'GET /foo?b_min=1&b__lt=5&c__in=x%2Cy',
+        "server: b > 1, b < 5, (c == 'x' or c == 'y')",
+        "python: a == 1, c startswith 'x', (a == 1 or c == 'y'), <lambda>",
+    ])
+
+    # conflicting parameters are evaluated in Python
+    plan = client.Model.find(Model.b == 1, Model.b == 2, b=3).plan()
+    assert plan.params == dict()
+    assert len(plan.residuals) == 2
+
+    httpx_mock.add_response(url='http://lol/foo?b_min=1&b__lt=5', json=dict(
+        items=[dict(a=1, b=2), dict(a=2, b=3)],
+    ))
+    httpx_mock.add_response(
+        url='http://lol/foo?page=2&b_min=1&b__lt=5',
+        json=dict(),
+    )
+    result = await client.Model.find(
+        (Model.b > 1) & (Model.b < 5) & (Model.a == 2),
+    ).list()
+    assert [x.b for x in result] == [3]
+
+
 @pytest.mark.asyncio
 async def test_model_crud(httpx_mock, client_class):
     class Model(client_class.Model):
@@ -1106,6 +1687,474 @@ def test_class_override(client_class):
     assert TestClient().debug
 
 
+def test_client_pool():
+    client = chttpx.Client(concurrency=50)
+    assert client.semaphore._value == 50
+    limits = client.client._transport._pool
+    assert limits._max_connections == 50
+    assert limits._max_keepalive_connections == 50
+    assert not limits._http2
+
+    client = chttpx.Client(max_connections=3, keepalive_expiry=1)
+    limits = client.client._transport._pool
+    assert limits._max_connections == 3
+    # httpcore caps keepalive connections to max connections
+    assert limits._max_keepalive_connections == 3
+    assert limits._keepalive_expiry == 1
+
+    client = chttpx.Client(limits=httpx.Limits(max_connections=2))
+    assert client.client._transport._pool._max_connections == 2
+
+
+@pytest.mark.asyncio
+async def test_client_pool_metrics():
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            await asyncio.sleep(.01)
+            await request.extensions['trace']('connection.started', {})
+            await asyncio.sleep(.01)
+            return httpx.Response(200)
+
+    traced = []
+
+    async def trace(name, info):
+        traced.append(name)
+
+    client = chttpx.Client(transport=Transport(), base_url='http://lol')
+    await asyncio.gather(*[
+        client.get('/', extensions=dict(trace=trace)) for i in range(3)
+    ])
+    metrics = client.pool_metrics
+    assert metrics.requests == 3
+    assert metrics.waiting == 0
+    assert metrics.waiting_max == 3
+    assert .01 <= metrics.wait_max < .02
+    assert .01 <= metrics.wait_average <= metrics.wait_max
+    assert traced == ['connection.started'] * 3
+
+
+@pytest.mark.asyncio
+async def test_client_logging_off(caplog):
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            return httpx.Response(200, json=data)
+
+    data = [dict(id=i, name=f'object {i}', tags=['a', 'b']) for i in range(50)]
+    client = chttpx.Client(transport=Transport(), base_url='http://lol')
+
+    async def bench():
+        start = time.perf_counter()
+        for i in range(50):
+            await client.post('/', json=data)
+        return (time.perf_counter() - start) / 50
+
+    caplog.set_level(logging.DEBUG, logger='cli2')
+    on = await bench()
+
+    caplog.set_level(logging.WARNING, logger='cli2')
+    caplog.clear()
+    with mock.patch.object(client, 'request_log_data') as request_log_data:
+        with mock.patch.object(client, 'response_log_data') as response_log:
+            off = await bench()
+    assert not request_log_data.called
+    assert not response_log.called
+    assert not caplog.records
+    assert off < on
+
+    # the mask still learns secrets from requests
+    client.mask.keys.add('password')
+    await client.post('/', json=dict(password='secret'))
+    assert 'secret' in client.mask.values
+
+
+@pytest.mark.parametrize('backend', ['orjson', 'json'])
+def test_json_codec(backend):
+    if backend != 'json':
+        pytest.importorskip(backend)
+    codec = chttpx.JSONCodec(backend)
+    data = dict(a=[1, 'é', None], b={1: 2})
+    assert codec.loads(codec.dumps(data)) == dict(a=[1, 'é', None], b={'1': 2})
+    assert codec.loads(codec.dumps(2 ** 70)) == 2 ** 70
+    with pytest.raises(json.JSONDecodeError):
+        codec.loads(b'{')
+
+
+def test_json_codec_default():
+    pytest.importorskip('orjson')
+    assert chttpx.JSONCodec().backend == 'orjson'
+
+
+@pytest.mark.asyncio
+async def test_response_json_cache(httpx_mock, client_class):
+    httpx_mock.add_response(url='http://lol/', json=[dict(a=1)])
+    httpx_mock.add_response(url='http://lol/?page=2', json=[dict(a=2)])
+    httpx_mock.add_response(url='http://lol/?page=3', json=[])
+    httpx_mock.add_response(url='http://lol/bad', content=b'{')
+    client = client_class(base_url='http://lol')
+    client.json_codec = chttpx.JSONCodec('json')
+
+    with mock.patch.object(client.json_codec, 'loads') as loads:
+        loads.side_effect = json.loads
+        assert await client.paginate('/').list() == [dict(a=1), dict(a=2)]
+        # once per page, despite logging, initialize and response_items
+        assert loads.call_count == 3
+
+        response = await client.get('/bad')
+        for i in range(2):
+            with pytest.raises(json.JSONDecodeError):
+                response.json()
+        assert loads.call_count == 4
+
+    httpx_mock.add_response(url='http://lol/', method='POST')
+    await client.post('/', json=dict(a='é'))
+    request = httpx_mock.get_requests()[-1]
+    assert request.headers['content-type'] == 'application/json'
+    assert request.content == '{"a":"é"}'.encode()
+
+
+@pytest.mark.asyncio
+async def test_response_json_mutation(httpx_mock, client_class, tmp_path):
+    class Model(client_class.Model):
+        url_list = '/'
+        id = chttpx.Field()
+        city = chttpx.Field('address/city')
+
+    httpx_mock.add_response(
+        url='http://lol/',
+        method='POST',
+        json=dict(id=1, address=dict(city='x')),
+    )
+    client = client_class(base_url='http://lol')
+    path = tmp_path / 'log'
+    cli2.configure(str(path), log_queue=10)
+    try:
+        obj = client.Model()
+        response = await obj.save()
+        obj.city = 'changed'
+        cli2.flush()
+    finally:
+        cli2.configure()
+
+    assert obj.data['address']['city'] == 'changed'
+    assert response.json() == dict(id=1, address=dict(city='x'))
+    logged, = [
+        entry['json'] for entry in cli2.parse(path.read_text())
+        if entry.get('json', {}).get('id') == 1
+    ]
+    assert logged['address']['city'] == 'x'
+
+
+async def chunked(content, size):
+    for i in range(0, len(content), size):
+        yield content[i:i + size]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('size', [1, 3, 1000])
+async def test_json_codec_items(size, monkeypatch):
+    monkeypatch.setattr(chttpx, 'ijson', None)
+    codec = chttpx.JSONCodec()
+    data = [1, 123, 'é, ]', dict(a=[1, 2]), None, 1.5e3, []]
+
+    async def items(content, key=None):
+        chunks = chunked(json.dumps(content, indent=1).encode(), size)
+        return [item async for item in codec.items(chunks, key)]
+
+    assert await items(data) == data
+    assert await items([]) == []
+    assert await items(dict(count=2, results=data), 'results') == data
+    assert await items(dict(count=2), 'results') == []
+    with pytest.raises(json.JSONDecodeError):
+        await items(dict(results=data))
+    with pytest.raises(json.JSONDecodeError):
+        [item async for item in codec.items(chunked(b'[1, {', size))]
+
+
+@pytest.mark.asyncio
+async def test_json_codec_items_ijson():
+    pytest.importorskip('ijson')
+    codec = chttpx.JSONCodec()
+    chunks = chunked(b'{"a": 1, "results": [{"a": 1.5}, 2]}', 3)
+    items = [item async for item in codec.items(chunks, 'results')]
+    assert items == [dict(a=1.5), 2]
+
+
+@pytest.mark.asyncio
+async def test_paginate_stream():
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            self.params = dict(request.url.params)
+            if request.url.path == '/error':
+                return httpx.Response(500, content=b'{"error": 1}')
+            content = json.dumps(
+                [dict(id=i) for i in range(1000)]
+            ).encode()
+            return httpx.Response(200, stream=Stream(chunked(content, 100)))
+
+    class Stream(httpx.AsyncByteStream):
+        def __init__(self, chunks):
+            self.chunks = chunks
+            self.closed = False
+
+        async def __aiter__(self):
+            async for chunk in self.chunks:
+                read.append(chunk)
+                yield chunk
+
+        async def aclose(self):
+            self.closed = True
+
+    read = []
+    transport = Transport()
+    limiter = chttpx.RateLimiter(concurrency=1)
+    client = chttpx.Client(
+        transport=transport,
+        base_url='http://lol',
+        handler=chttpx.Handler(tries=0, backoff=0),
+        concurrency=1,
+        limiter=limiter,
+    )
+    paginator = client.paginate('/', params=dict(a=1), stream=True)
+    async for item in paginator:
+        # items are yielded while the response is still downloading
+        assert len(read) < 100
+        # which holds the request resources until the stream is closed
+        assert client.semaphore.locked()
+        assert limiter.hosts['lol'].requests == 1
+        assert client._client_requests
+        if item['id'] == 10:
+            break
+    assert transport.params == dict(a='1')
+
+    items = await client.paginate('/', stream=True).list()
+    assert len(items) == 1000
+    assert not client.semaphore.locked()
+    assert not limiter.hosts['lol'].requests
+    assert not client._client_requests
+
+    with pytest.raises(chttpx.RetriesExceededError) as exc:
+        await client.paginate('/error', stream=True).list()
+    assert 'error' in str(exc.value)
+
+
+@pytest.mark.asyncio
+async def test_batch():
+    running = []
+
+    async def call(number):
+        running.append(number)
+        assert len(running) <= 3
+        await asyncio.sleep(.001)
+        running.remove(number)
+        if number == 5:
+            raise Exception('oops')
+        return number
+
+    async with chttpx.Client().batch(3) as batch:
+        for number in range(10):
+            batch.add(call, number)
+        batch.add(lambda: 'sync')
+    assert batch.results[:5] == [0, 1, 2, 3, 4]
+    assert batch.results[6:] == [6, 7, 8, 9, 'sync']
+    assert list(batch.errors) == [5]
+    assert batch.results[5] is batch.errors[5]
+
+
+@pytest.mark.asyncio
+async def test_model_bulk(client_class):
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            requests.append(request)
+            data = json.loads(request.content or 'null')
+            if request.url.path == '/bulk':
+                if request.method == 'POST':
+                    return httpx.Response(201, json=[
+                        dict(item, id=item['name']) for item in data
+                    ])
+                return httpx.Response(200 if 'bad' not in data else 400)
+            if data and data.get('name') == 'bad':
+                return httpx.Response(400)
+            return httpx.Response(201, json=dict(data or {}, id=1))
+
+    class TestModel(client_class.Model):
+        url_list = '/test'
+        id = chttpx.Field()
+        name = chttpx.Field()
+
+    requests = []
+    client = client_class(transport=Transport())
+    errors = await client.TestModel.bulk_create(
+        [dict(name='a'), client.TestModel(name='bad'), dict(name='c')],
+    )
+    assert len(requests) == 3
+    obj, exc = errors[0]
+    assert obj.name == 'bad'
+    assert isinstance(exc, chttpx.RefusedResponseError)
+
+    objs = [client.TestModel(id=i) for i in range(3)]
+    assert not await client.TestModel.bulk_delete(objs)
+    assert sorted(r.url.path for r in requests[3:]) == [
+        '/test/0', '/test/1', '/test/2',
+    ]
+
+    # bulk endpoint, in chunks
+    requests.clear()
+    client.TestModel.url_bulk = '/bulk'
+    client.TestModel.bulk_size = 2
+    objs = [client.TestModel(name=name) for name in 'abc']
+    assert not await client.TestModel.bulk_create(objs)
+    assert [obj.id for obj in objs] == ['a', 'b', 'c']
+    assert [json.loads(r.content) for r in requests] == [
+        [dict(name='a'), dict(name='b')], [dict(name='c')],
+    ]
+
+    objs.append(client.TestModel(id='bad'))
+    errors = await client.TestModel.bulk_delete(objs)
+    assert [obj.id for obj, exc in errors] == ['c', 'bad']
+    assert requests[-1].method == 'DELETE'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('backend', ['memory', 'file'])
+async def test_response_cache(backend, tmp_path, caplog):
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            requests.append(request)
+            if request.url.path == '/fresh':
+                return httpx.Response(
+                    200,
+                    json=[len(requests)],
+                    headers={'Cache-Control': 'max-age=60'},
+                )
+            if request.url.path == '/nostore':
+                return httpx.Response(
+                    200,
+                    json=[len(requests)],
+                    headers={'Cache-Control': 'no-store', 'ETag': '"1"'},
+                )
+            if request.headers.get('if-none-match') == '"1"':
+                return httpx.Response(304, headers={'ETag': '"1"'})
+            return httpx.Response(200, json=[len(requests)], headers={
+                'ETag': '"1"',
+                'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT',
+            })
+
+    if backend == 'file':
+        cache = chttpx.FileResponseCache(tmp_path)
+    else:
+        cache = chttpx.ResponseCache()
+    requests = []
+    caplog.set_level(logging.INFO, logger='cli2')
+    client = chttpx.Client(
+        transport=Transport(),
+        base_url='http://lol',
+        cache=cache,
+    )
+
+    response = await client.get('/fresh')
+    assert response.extensions['cache'] == 'miss'
+    response = await client.get('/fresh')
+    assert response.extensions['cache'] == 'hit'
+    assert response.json() == [1]
+    assert len(requests) == 1
+
+    response = await client.get('/etag')
+    assert response.json() == [2]
+    response = await client.get('/etag')
+    assert response.extensions['cache'] == 'revalidated'
+    assert response.status_code == 200
+    assert response.json() == [2]
+    assert requests[-1].headers['if-none-match'] == '"1"'
+    assert requests[-1].headers['if-modified-since'] == (
+        'Wed, 21 Oct 2015 07:28:00 GMT'
+    )
+
+    await client.get('/nostore')
+    assert (await client.get('/nostore')).json() == [5]
+    assert caplog.records[-1].msg['cache'] == 'miss'
+    assert caplog.records[-1].msg['cache_hits'] == 2
+    await client.post('/fresh')
+    assert len(requests) == 6
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    if backend == 'file':
+        # shared between runs
+        cache = chttpx.FileResponseCache(tmp_path)
+        client = chttpx.Client(transport=Transport(), cache=cache)
+        response = await client.get('http://lol/fresh')
+        assert response.extensions['cache'] == 'hit'
+        assert response.json() == [1]
+
+
+@pytest.mark.asyncio
+async def test_response_cache_revalidate_no_store():
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            requests.append(request)
+            if request.headers.get('if-none-match') == '"1"':
+                return httpx.Response(304, headers={
+                    'ETag': '"1"',
+                    'Cache-Control': 'no-store',
+                })
+            return httpx.Response(200, json=[len(requests)], headers={
+                'ETag': '"1"',
+            })
+
+    requests = []
+    cache = chttpx.ResponseCache()
+    client = chttpx.Client(
+        transport=Transport(),
+        base_url='http://lol',
+        cache=cache,
+    )
+    assert (await client.get('/')).json() == [1]
+    response = await client.get('/')
+    assert response.status_code == 200
+    assert response.extensions['cache'] == 'revalidated'
+    assert response.json() == [1]
+    assert response.headers['cache-control'] == 'no-store'
+    # not stored anymore
+    assert not cache.entries
+    assert (await client.get('/')).json() == [3]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_response_cache_identity():
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            return httpx.Response(
+                200,
+                json=[request.headers.get('authorization')],
+                headers={'Cache-Control': 'max-age=60'},
+            )
+
+    cache = chttpx.ResponseCache()
+    clients = [
+        chttpx.Client(
+            transport=Transport(),
+            base_url='http://lol',
+            cache=cache,
+            headers={'Authorization': token},
+        )
+        for token in ('alice', 'bob')
+    ]
+    for client in clients * 2:
+        response = await client.get('/fresh')
+        assert response.json() == [client.client.headers['authorization']]
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert not any('alice' in key for key in cache.entries)
+
+
+def test_response_cache_lru():
+    cache = chttpx.ResponseCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert list(cache.entries) == ['a', 'c']
+
+
 @pytest.mark.asyncio
 async def test_save(client_class, httpx_mock):
     class TestModel(client_class.Model):
@@ -1328,6 +2377,55 @@ def test_field_callback_recursion(client_class):
     assert model.final == 'lolval2val3'
 
 
+def test_field_compiled(client_class):
+    class TestModel(client_class.Model):
+        foo = chttpx.Field()
+        bar = chttpx.Field('a/b/c')
+
+    assert TestModel.foo.path == ('foo',)
+    assert TestModel.bar.path == ('a', 'b', 'c')
+    model = client_class().TestModel(dict(foo=1))
+    assert model.bar is None
+    model.bar = 2
+    assert model.data == dict(foo=1, a=dict(b=dict(c=2)))
+    assert model.changed_fields == dict(bar=None)
+
+    TestModel.foo.data_accessor = 'x/y'
+    assert TestModel.foo.path == ('x', 'y')
+
+    # bookkeeping is allocated on demand, other attributes still work
+    model = client_class().TestModel(dict(foo=1))
+    assert '__dict__' in chttpx.Model.__slots__
+    assert model._changed is None and model._cache is None
+    model.other = 1
+    assert vars(model) == dict(other=1)
+    assert weakref.ref(model)() is model
+
+
+def test_field_benchmark(client_class):
+    class TestModel(client_class.Model):
+        id = chttpx.Field()
+        city = chttpx.Field('address/city')
+
+    model = client_class().TestModel
+    data = [dict(id=i, address=dict(city='x')) for i in range(20_000)]
+
+    objs = [model(item) for item in data]
+
+    start = time.perf_counter()
+    for obj in objs:
+        obj.id
+        obj.city
+    get = time.perf_counter() - start
+
+    for obj in objs:
+        obj.city = 'y'
+    assert objs[-1].data['address']['city'] == 'y'
+
+    # generous bound, about 10x the time on a laptop
+    assert get / len(objs) / 2 < 1e-5
+
+
 def test_virtual(client_class):
     class TestModel(client_class.Model):
         virt = chttpx.VirtualField()
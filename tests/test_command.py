@@ -732,3 +732,23 @@ def test_factory_value_args():
 
     cmd = cli2.Command(mycmd)
     assert cmd('a') == 'a'
+
+
+def test_keys_cache():
+    def foo(a, b=None, *, c=None): pass
+    cmd = cli2.Command(foo)
+    assert cmd.keys() == ['a', 'b', 'c']
+    assert cmd.keys() is cmd.keys()
+    assert [*cmd.aliases()] == ['b', 'c']
+
+    cmd.arg('d', kind='KEYWORD_ONLY', position=0, default=None)
+    assert cmd.keys() == ['d', 'a', 'b', 'c']
+    assert [*cmd.aliases()] == ['d', 'b', 'c']
+    cmd.parse('d=1', 'x', 'c=2')
+    assert cmd['d'].value == '1'
+    assert cmd['a'].value == 'x'
+    assert cmd['c'].value == '2'
+
+    del cmd['d']
+    assert cmd.keys() == ['a', 'b', 'c']
+    assert [*cmd.aliases()] == ['b', 'c']
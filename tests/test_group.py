@@ -116,6 +116,21 @@ def test_group_cmdclass():
     assert not isinstance(group['help'], CommandSubject)
 
 
+def test_group_lazy():
+    group = cli2.Group(posix=True)
+
+    @group.cmd(name='foo')
+    def bar(some_arg=None):
+        return some_arg
+
+    assert isinstance(dict.__getitem__(group, 'foo'), cli2.Lazy)
+    assert group('foo', '--some-arg=x') == 'x'
+    assert isinstance(dict.__getitem__(group, 'foo'), cli2.Command)
+    assert group['foo'].group is group
+    assert group['foo'].posix
+    assert isinstance(dict.__getitem__(group, 'help'), cli2.Lazy)
+
+
 def test_inject():
     outer = cli2.Group(name="outer")
     inner = cli2.Group()
@@ -0,0 +1,43 @@
+import cli2
+import os
+import subprocess
+import sys
+
+
+def importtime(code, home):
+    """ Run code in a new python, return cumulative import times in us. """
+    env = dict(os.environ, HOME=str(home))
+    env.pop('LOG_FILE', None)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = dict()
+    for line in proc.stderr.split('\n'):
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def test_import_lazy(tmp_path):
+    modules = importtime('import cli2', tmp_path)
+    for name in ('cli2.cli', 'cli2.display', 'cli2.traceback', 'yaml'):
+        assert name not in modules
+    # logging is configured on first use: no file system side effect
+    assert not list(tmp_path.iterdir())
+
+
+def test_import_configure_on_first_log(tmp_path):
+    modules = importtime('import cli2; cli2.log.info("hi")', tmp_path)
+    assert 'logging.config' in modules
+    assert list((tmp_path / '.local/cli2/log').iterdir())
+
+
+def test_import_lazy_attribute():
+    assert cli2.Group.__module__ == 'cli2.cli'
+    assert 'Group' in dir(cli2)
@@ -1,8 +1,11 @@
 import cli2
+import logging
+import queue
 
+from cli2.log import QueueHandler, enabled
 
-def test_log_parse():
-    logs = '''
+
+LOGS = '''
 
 name: tes2980898zzzyzy7
  method=POST url=http://localhost:8000/objects/ event=request level=debug timestamp=2025-03-21 10:09:40
@@ -21,7 +24,9 @@ name:
  method=POST url=http://localhost:8000/objects/ status_code=400 event=response level=info timestamp=2025-03-21 10:09:40
     '''
 
-    result = cli2.parse(logs)
+
+def test_log_parse():
+    result = cli2.parse(LOGS)
     assert result == [{'event': 'request',
       'json': {'name': 'tes2980898zzzyzy7'},
       'level': 'debug',
@@ -49,3 +54,78 @@ name:
       'status_code': '400',
       'timestamp': '2025-03-21 10:09:40',
       'url': 'http://localhost:8000/objects/'}]
+
+
+def test_log_queue(tmp_path):
+    path = tmp_path / 'log'
+    cli2.configure(str(path), log_queue=10)
+    try:
+        handler, = logging.getLogger('cli2').handlers
+        assert isinstance(handler, QueueHandler)
+        assert handler.queue.maxsize == 10
+
+        cli2.log.info('queued', json=dict(a=1))
+        try:
+            raise Exception('oops')
+        except Exception:
+            cli2.log.exception('failed')
+        cli2.flush()
+
+        contents = path.read_text()
+        assert 'a: 1\n event=queued' in contents
+        assert "Traceback" in contents
+        assert "test_log_queue" in contents
+    finally:
+        cli2.configure()
+
+
+def test_log_queue_drop():
+    handler = QueueHandler(queue.Queue(1), 'drop')
+    record = logging.makeLogRecord(dict(msg='foo'))
+    handler.enqueue(record)
+    handler.enqueue(record)
+    assert handler.dropped == 1
+
+
+def test_log_iter_entries(tmp_path):
+    path = tmp_path / 'log'
+    path.write_text(LOGS)
+    assert list(cli2.iter_entries(path)) == cli2.parse(LOGS)
+
+
+def test_log_jsonl(tmp_path):
+    path = tmp_path / 'log'
+    cli2.configure(str(path), log_format='jsonl')
+    try:
+        cli2.log.info('response', status_code=200, json=dict(a=[1]))
+        cli2.log.debug('request', url='/foo')
+    finally:
+        cli2.configure()
+
+    entries = list(cli2.iter_entries(path))
+    for entry in entries:
+        entry.pop('timestamp', None)
+    assert entries == [
+        dict(
+            event='response',
+            level='info',
+            status_code=200,
+            json=dict(a=[1]),
+        ),
+        dict(event='request', level='debug', url='/foo'),
+    ]
+
+
+def test_log_enabled(tmp_path):
+    logger = logging.getLogger('cli2')
+    cli2.configure('none')
+    logger.propagate = False
+    try:
+        assert not enabled(logging.DEBUG)
+        assert enabled(logging.WARNING)
+
+        cli2.configure(str(tmp_path / 'log'), log_queue=10)
+        logger.propagate = False
+        assert enabled(logging.DEBUG)
+    finally:
+        cli2.configure()
@@ -28,3 +28,86 @@ def test_mask():
 def test_mask_longest():
     mask = cli2.Mask(values=['val', 'val2'])
     assert mask('val2 val') == '***MASKED*** ***MASKED***'
+
+
+@pytest.mark.parametrize('values,text', [
+    (['xsec', 'secret'], 'xsecret'),
+    (['ab', 'bcdef'], 'abcdef'),
+    (['ab', 'bc', 'cd'], 'abcd'),
+])
+def test_mask_overlap(values, text):
+    mask = cli2.Mask(values=values)
+    assert mask(text) == '***MASKED***'
+    assert mask(f'a {text} b') == 'a ***MASKED*** b'
+
+    for size in range(1, len(text) + 1):
+        stream = mask.stream()
+        result = ''
+        for start in range(0, len(text), size):
+            result += stream.write(text[start:start + size])
+        assert result + stream.flush() == '***MASKED***'
+
+
+def test_mask_pattern():
+    mask = cli2.Mask(values=['ab', 'abc', 'a.c', 123])
+    assert mask('abcd ab axc a.c 1234') == (
+        '***MASKED***d ***MASKED*** axc ***MASKED*** ***MASKED***4'
+    )
+    pattern = mask._pattern
+
+    assert mask('abc') == '***MASKED***'
+    assert mask._pattern is pattern
+
+    mask.values.add('xyz')
+    assert mask('xyz') == '***MASKED***'
+    assert mask._pattern is not pattern
+
+    mask.values.add('')
+    assert mask('foo') == 'foo'
+
+
+def test_mask_copy():
+    mask = cli2.Mask(['seckey'])
+    fixture = {
+        'a': {'b': 'foo', 'c': ['bar']},
+        'd': [{'e': 'the secret is here'}],
+        'f': {'seckey': 'secret'},
+    }
+    result = mask(fixture)
+    assert result == {
+        'a': {'b': 'foo', 'c': ['bar']},
+        'd': [{'e': 'the ***MASKED*** is here'}],
+        'f': {'seckey': '***MASKED***'},
+    }
+    assert mask.values == {'secret'}
+
+    # input is left untouched
+    assert fixture['f']['seckey'] == 'secret'
+    assert fixture['d'][0]['e'] == 'the secret is here'
+
+    # unchanged containers are shared
+    assert result['a'] is fixture['a']
+    assert result['d'] is not fixture['d']
+
+
+@pytest.mark.parametrize('size', range(1, 8))
+def test_mask_stream(size):
+    mask = cli2.Mask(values=['secret', 'sec', 'cret'])
+    text = 'a secret, secre, sec, cret, secretsecret.'
+    stream = mask.stream()
+    result = ''
+    for start in range(0, len(text), size):
+        result += stream.write(text[start:start + size])
+        assert len(stream.buffer) < 6
+    result += stream.flush()
+    assert result == mask(text)
+    assert result == (
+        'a ***MASKED***, ***MASKED***re, ***MASKED***, ***MASKED***, '
+        '***MASKED******MASKED***.'
+    )
+
+
+def test_mask_stream_noop():
+    stream = cli2.Mask().stream()
+    assert stream.write('foo') == 'foo'
+    assert stream.flush() == ''
@@ -1,3 +1,4 @@
+import asyncio
 import cli2
 import os
 import pytest
@@ -114,3 +115,31 @@ async def test_proc_quiet_mode():
     await proc.start()
     await proc.wait()
     assert proc.out == "hello"
+
+
+@pytest.mark.asyncio
+async def test_proc_mask(capsys):
+    mask = cli2.Mask(values=['secret'])
+    proc = cli2.Proc('echo', 'my secret', mask=mask)
+    assert proc.clone().mask is mask
+    await proc.wait()
+    assert capsys.readouterr().out == 'my ***MASKED***\n'
+    assert proc.out == 'my secret'
+
+
+@pytest.mark.asyncio
+async def test_proc_mask_live(capsys):
+    mask = cli2.Mask(values=['secret', 'x' * 40])
+    proc = cli2.Proc('sh', '-c', 'echo step 1 secret; read x; echo done',
+                     mask=mask)
+    await proc.start()
+    for _ in range(100):
+        if capsys.readouterr().out == 'step 1 ***MASKED***\n':
+            break
+        await asyncio.sleep(.01)
+    else:
+        raise AssertionError('masked line not printed before exit')
+    assert proc.proc.returncode is None
+    proc.proc.stdin.write(b'\n')
+    await proc.wait()
+    assert capsys.readouterr().out == 'done\n'